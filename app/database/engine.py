@@ -0,0 +1,77 @@
+import time
+
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from app.utils.metrics import metrics
+
+
+DB_QUERY_SECONDS = metrics.histogram("db_query_seconds", "Время выполнения SQL-запросов", ["operation"])
+
+
+def _sqlite_pragmas(busy_timeout_ms: int, mmap_size: int, cache_size: int) -> list[str]:
+    return [
+        # Читатели не блокируют писателя, commit — запись в журнал без fsync всей базы
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        # Вместо мгновенного "database is locked" ждать освобождения блокировки
+        f"PRAGMA busy_timeout={busy_timeout_ms}",
+        f"PRAGMA mmap_size={mmap_size}",
+        # Отрицательное значение — размер в КиБ, а не в страницах
+        f"PRAGMA cache_size={cache_size}",
+    ]
+
+
+def observe_queries(engine: AsyncEngine):
+    """Замер времени каждого запроса в db_query_seconds с меткой SELECT/INSERT/UPDATE/..."""
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        context.query_started = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+        DB_QUERY_SECONDS.observe(time.perf_counter() - context.query_started, operation=operation)
+
+
+def create_db_engine(
+    url: str,
+    sqlite_busy_timeout_ms=5000,
+    sqlite_mmap_size=268435456,
+    sqlite_cache_size=-20000,
+    pool_size=5,
+    echo=False
+) -> AsyncEngine:
+    """
+    Движок по DSN из настроек.
+
+    Для SQLite на каждое новое соединение выставляются прагмы WAL,
+    synchronous=NORMAL, busy_timeout, mmap_size и cache_size. Для остальных
+    СУБД (например, postgresql+asyncpg://...) ещё и проверка соединений из пула.
+    """
+    if url.startswith("sqlite"):
+        pool = {} if ":memory:" in url else {"pool_size": pool_size, "max_overflow": pool_size}
+        engine = create_async_engine(url, echo=echo, **pool)
+        pragmas = _sqlite_pragmas(sqlite_busy_timeout_ms, sqlite_mmap_size, sqlite_cache_size)
+
+        @event.listens_for(engine.sync_engine, "connect")
+        def _on_connect(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
+    else:
+        engine = create_async_engine(url, echo=echo, pool_size=pool_size, max_overflow=pool_size, pool_pre_ping=True)
+
+    observe_queries(engine)
+    return engine
+
+
+def upsert(engine: AsyncEngine, model):
+    """INSERT с поддержкой on_conflict_do_update для диалекта движка (SQLite или PostgreSQL)."""
+    if engine.dialect.name == "postgresql":
+        return postgresql.insert(model)
+    if engine.dialect.name == "sqlite":
+        return sqlite.insert(model)
+    raise NotImplementedError(f"Upsert не поддерживается для {engine.dialect.name}")
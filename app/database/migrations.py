@@ -0,0 +1,141 @@
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+schema_version = Table(
+    "schema_version", MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("description", String(200)),
+    Column("applied_at", DateTime)
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    apply: Callable[[Connection], None]
+
+
+MIGRATIONS: list[Migration] = []
+
+
+def migration(version: int, description: str):
+    """
+    Регистрирует миграцию схемы. Миграции выполняются по возрастанию версии,
+    каждая в своей транзакции, и должны быть идемпотентны: на свежей базе
+    create_all уже создал всё по моделям, и миграция лишь отмечается применённой.
+    """
+    def decorator(func):
+        MIGRATIONS.append(Migration(version, description, func))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return func
+    return decorator
+
+
+@migration(1, "Уникальный индекс users.tg_id")
+def _users_tg_id(conn: Connection):
+    # Гонка в старом set_user могла создать по две строки на пользователя — оставляем первую
+    removed = conn.execute(text(
+        "DELETE FROM users WHERE id NOT IN (SELECT MIN(id) FROM users GROUP BY tg_id)"
+    )).rowcount
+    if removed:
+        logging.warning(f"Миграция 1: удалено дубликатов пользователей: {removed}")
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS uq_users_tg_id ON users (tg_id)"))
+
+
+@migration(2, "Индекс users.is_subscribed")
+def _users_is_subscribed(conn: Connection):
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_users_is_subscribed ON users (is_subscribed)"))
+
+
+@migration(3, "Уникальный индекс ников без учёта регистра")
+def _users_mc_name(conn: Connection):
+    # Ник остаётся у того, кто указал его первым; остальным бот предложит ввести ник заново
+    cleared = conn.execute(text(
+        "UPDATE users SET mc_name = NULL WHERE mc_name IS NOT NULL AND id NOT IN "
+        "(SELECT MIN(id) FROM users WHERE mc_name IS NOT NULL GROUP BY lower(mc_name))"
+    )).rowcount
+    if cleared:
+        logging.warning(f"Миграция 3: сброшено повторяющихся ников: {cleared}")
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS uq_users_mc_name_lower ON users (lower(mc_name))"))
+
+
+@migration(4, "Индексы снимков статистики и outbox")
+def _snapshot_and_outbox_indexes(conn: Connection):
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_score_snapshots_objective_value ON score_snapshots (objective, value)"
+    ))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_outbox_next_attempt_at ON outbox (next_attempt_at)"))
+
+
+@migration(5, "Ключ снимков статистики без учёта регистра")
+def _score_snapshots_key(conn: Connection):
+    columns = {column["name"] for column in inspect(conn).get_columns("score_snapshots")}
+    if "mc_key" not in columns:
+        conn.execute(text("ALTER TABLE score_snapshots ADD COLUMN mc_key VARCHAR(50)"))
+    conn.execute(text("UPDATE score_snapshots SET mc_key = lower(mc_name) WHERE mc_key IS NULL"))
+    # Один игрок мог быть сохранён в разных написаниях ника — оставляем последнюю запись
+    removed = conn.execute(text(
+        "DELETE FROM score_snapshots WHERE id NOT IN "
+        "(SELECT MAX(id) FROM score_snapshots GROUP BY mc_key, objective)"
+    )).rowcount
+    if removed:
+        logging.warning(f"Миграция 5: удалено повторяющихся снимков статистики: {removed}")
+    if conn.dialect.name == "postgresql":
+        conn.execute(text(
+            "ALTER TABLE score_snapshots DROP CONSTRAINT IF EXISTS uq_score_snapshots_player_objective"
+        ))
+    # В SQLite старое ограничение (mc_name, objective) удаляется только пересозданием
+    # таблицы; оно остаётся, но ничему не мешает: одинаковый ник даёт одинаковый ключ
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_score_snapshots_key_objective ON score_snapshots (mc_key, objective)"
+    ))
+
+
+async def run_migrations(engine: AsyncEngine) -> int:
+    """Применить недостающие миграции; возвращает текущую версию схемы."""
+    async with engine.begin() as conn:
+        await conn.run_sync(schema_version.create, checkfirst=True)
+        applied = set((await conn.execute(select(schema_version.c.version))).scalars())
+
+    for item in MIGRATIONS:
+        if item.version in applied:
+            continue
+        async with engine.begin() as conn:
+            await conn.run_sync(item.apply)
+            await conn.execute(schema_version.insert().values(
+                version=item.version, description=item.description, applied_at=datetime.utcnow()
+            ))
+        applied.add(item.version)
+        logging.info(f"Миграция {item.version} применена: {item.description}")
+
+    return max(applied, default=0)
+
+
+def _existing_indexes(conn: Connection, tables) -> set[str]:
+    if conn.dialect.name == "sqlite":
+        # Инспектор SQLAlchemy не отражает индексы по выражениям (lower(mc_name))
+        rows = conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'"))
+        return {row[0] for row in rows}
+    inspector = inspect(conn)
+    return {index["name"] for table in tables for index in inspector.get_indexes(table.name)}
+
+
+async def missing_indexes(engine: AsyncEngine, metadata: MetaData) -> list[str]:
+    """Индексы, описанные в моделях, но отсутствующие в базе."""
+    tables = list(metadata.tables.values())
+    async with engine.connect() as conn:
+        existing = await conn.run_sync(_existing_indexes, tables)
+    return sorted(
+        f"{table.name}.{index.name}"
+        for table in tables
+        for index in table.indexes
+        if index.name not in existing
+    )
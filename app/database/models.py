@@ -1,14 +1,26 @@
+import logging
 from datetime import datetime
 
-from sqlalchemy import BigInteger, DateTime, String, ForeignKey, Boolean
+from sqlalchemy import BigInteger, DateTime, String, ForeignKey, Boolean, Integer, Index, Text
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
-from sqlalchemy.ext.asyncio import AsyncAttrs, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncAttrs, async_sessionmaker
 from sqlalchemy.sql import func
 
+from config import config
+from app.database.engine import create_db_engine
+from app.database.migrations import missing_indexes, run_migrations
 
-engine = create_async_engine("sqlite+aiosqlite:///db.sqlite3")
 
-async_session = async_sessionmaker(engine)
+engine = create_db_engine(
+    config.database_url,
+    sqlite_busy_timeout_ms=config.sqlite_busy_timeout_ms,
+    sqlite_mmap_size=config.sqlite_mmap_size,
+    sqlite_cache_size=config.sqlite_cache_size,
+    pool_size=config.db_pool_size
+)
+
+# Объекты остаются читаемыми после commit: пользователи из кэша живут дольше сессии
+async_session = async_sessionmaker(engine, expire_on_commit=False)
 
 
 class Base(AsyncAttrs, DeclarativeBase):
@@ -17,6 +29,12 @@ class Base(AsyncAttrs, DeclarativeBase):
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # get_user на каждое нажатие и upsert по tg_id
+        Index("uq_users_tg_id", "tg_id", unique=True),
+        # Рассылки выбирают только подписчиков
+        Index("ix_users_is_subscribed", "is_subscribed"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     tg_id = mapped_column(BigInteger)
@@ -28,7 +46,54 @@ class User(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
 
+# Один ник — один пользователь, без учёта регистра (как ник сравнивается в игре)
+Index("uq_users_mc_name_lower", func.lower(User.mc_name), unique=True)
+
+
+class ScoreSnapshot(Base):
+    __tablename__ = "score_snapshots"
+    __table_args__ = (
+        # Одна строка на игрока и цель, ник без учёта регистра; индекс же служит
+        # поиску значения игрока (место в топе, снимок при выключенном сервере)
+        Index("uq_score_snapshots_key_objective", "mc_key", "objective", unique=True),
+        # Топы и места игроков читаются по индексу без обхода таблицы
+        Index("ix_score_snapshots_objective_value", "objective", "value"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    # Ник в нижнем регистре — ключ строки; mc_name — написание для показа
+    mc_key: Mapped[str] = mapped_column(String(50))
+    mc_name: Mapped[str] = mapped_column(String(50))
+    objective: Mapped[str] = mapped_column(String(50))
+    value: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+
+class OutboxMessage(Base):
+    __tablename__ = "outbox"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    chat_id = mapped_column(BigInteger)
+    text: Mapped[str] = mapped_column(Text)
+    parse_mode: Mapped[str | None] = mapped_column(String(16), nullable=True)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, index=True)
+
+
+class BotState(Base):
+    """Служебные значения бота (например, курсор журнала логов)."""
+    __tablename__ = "bot_state"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    value: Mapped[str] = mapped_column(Text)
+
+
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
-    print("База данных и таблицы успешно созданы.")
\ No newline at end of file
+    # create_all не трогает уже существующие таблицы, индексы в них добавляют миграции
+    version = await run_migrations(engine)
+    for name in await missing_indexes(engine, Base.metadata):
+        logging.warning(f"В базе нет индекса {name}")
+    print(f"База данных и таблицы успешно созданы (версия схемы {version}).")
\ No newline at end of file
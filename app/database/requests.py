@@ -1,23 +1,37 @@
 import re
 import time
-import socket
 import asyncio
 import logging
-import paramiko
 from datetime import datetime, timedelta
 from mcstatus import JavaServer
-from mcrcon import MCRcon
 
 from aiogram import Bot
-from app.database.models import async_session
-from app.database.models import User
-from sqlalchemy import func, select, update
+from app.database.models import async_session, engine
+from app.database.engine import upsert
+from app.database.models import User, ScoreSnapshot, BotState
+from sqlalchemy import case, func, select, update
+from sqlalchemy.exc import IntegrityError
 
 import app.keyboards as kb
 import app.text as cs
 from aiogram.types import Message
 from config import config
-from app.utils.rcon_utils import RconClient
+from app.utils.rcon_utils import RconPool
+from app.utils.player_stats import PlayerStats, NO_DATA, parse_scoreboard_value, parse_tracked_players, scoreboard_get_command, stats_now
+from app.utils.stats_cache import StatsCache
+from app.utils.status_monitor import ServerState, StatusMonitor
+from app.utils.resolver import ResolveError, ResolverCache
+from app.utils.broadcast import Broadcaster
+from app.utils.outbox import Outbox
+from app.utils.digest import DigestAggregator
+from app.utils.log_classifier import classifier
+from app.utils.dedup import LineDeduplicator
+from app.utils.log_sources import build_log_source, cursor_time
+from app.utils.ssh_utils import SshSessionManager
+from app.utils.nick_registry import NickRegistry
+from app.utils.user_cache import UserCache
+from app.utils.server_stats import ServerStats, ServerStatsService
+from app.utils.metrics import metrics
 
 
 logging.basicConfig(
@@ -26,48 +40,104 @@ logging.basicConfig(
     handlers=[logging.StreamHandler()]
 )
 
-bot = Bot(token=config.bot_token.get_secret_value())
+line_dedup = LineDeduplicator(max_size=config.log_dedup_size)
 
-processed_lines = set()
-MAX_CACHE_SIZE = 100
+nick_registry = NickRegistry()
 
+user_cache = UserCache()
+
+STATUS_PROBE_SECONDS = metrics.histogram("status_probe_seconds", "Опрос статуса сервера (SLP) с повторами", ["result"])
+LOG_EVENT_LAG = metrics.histogram(
+    "log_event_lag_seconds", "От записи в журнале до обработки события ботом", ["kind"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+)
+
+resolver = ResolverCache()
+
+rcon_pool = RconPool(
+    host=config.mc_host.get_secret_value(),
+    port=config.rcon_port,
+    password=config.rcon_pass.get_secret_value(),
+    resolve=resolver.resolve_host
+)
+
+ssh = SshSessionManager(
+    host=config.mc_host.get_secret_value(),
+    port=config.ssh_port,
+    user=config.ssh_user.get_secret_value(),
+    password=config.ssh_pass.get_secret_value(),
+    resolve=resolver.resolve_host
+)
+
+metrics.gauge("ssh_connected", "Поднято ли SSH-соединение", collect=lambda: int(ssh.connected))
+metrics.gauge("user_cache_size", "Пользователей в кэше", collect=lambda: len(user_cache))
+
+
+async def _upsert_user(values: dict, update_columns) -> User:
+    """Один INSERT ... ON CONFLICT (tg_id) DO UPDATE ... RETURNING вместо SELECT и последующей записи."""
+    stmt = upsert(engine, User).values(**values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[User.tg_id],
+        set_=update_columns(stmt.excluded) or {"tg_id": stmt.excluded.tg_id}
+    ).returning(User)
 
-async def set_user(tg_id, name=None, username=None, is_subscribed=True):
     async with async_session() as session:
-        user = await session.scalar(select(User).where(User.tg_id == tg_id))
+        user = await session.scalar(stmt)
+        await session.commit()
+    user_cache.put(user)
+    return user
+
 
-        if not user:
-            user = User(
-                tg_id=tg_id,
-                name=name,
-                username=username,
-                is_subscribed=is_subscribed if is_subscribed is not None else False,
-                subscribed_at=(datetime.utcnow() + timedelta(hours=3)) if is_subscribed else None,
-                created_at=datetime.utcnow() + timedelta(hours=3)
+def _new_user_values(tg_id, name, username, is_subscribed) -> dict:
+    now = datetime.utcnow() + timedelta(hours=3)
+    return dict(
+        tg_id=tg_id,
+        name=name,
+        username=username,
+        is_subscribed=bool(is_subscribed),
+        subscribed_at=now if is_subscribed else None,
+        created_at=now
+    )
+
+
+async def set_user(tg_id, name=None, username=None, is_subscribed=True) -> User:
+    """Создать пользователя или обновить переданные (не None) поля."""
+    def update_columns(excluded):
+        columns = {}
+        if name is not None:
+            columns["name"] = excluded.name
+        if username is not None:
+            columns["username"] = excluded.username
+        if is_subscribed is not None:
+            columns["is_subscribed"] = excluded.is_subscribed
+            # Дата подписки меняется, только если статус действительно изменился
+            columns["subscribed_at"] = case(
+                (User.is_subscribed == excluded.is_subscribed, User.subscribed_at),
+                else_=excluded.subscribed_at
             )
-            session.add(user)
-            await session.commit()
-        else:
-            updated = False
-            if (name is not None and user.name != name):
-                user.name = name
-                updated = True
-            if (username is not None and user.username != username):
-                user.username = username
-                updated = True
+        return columns
 
-            if is_subscribed is not None and user.is_subscribed != is_subscribed:
-                user.is_subscribed = is_subscribed
-                user.subscribed_at = (datetime.utcnow() + timedelta(hours=3)) if is_subscribed else None
-                updated = True
+    return await _upsert_user(_new_user_values(tg_id, name, username, is_subscribed), update_columns)
 
-            if updated:
-                await session.commit()
+
+async def upsert_user(tg_id: int, name: str, username: str | None) -> User:
+    """Пользователь для текущего апдейта: новые подписываются на уведомления, у старых обновляются имя и username."""
+    return await _upsert_user(
+        _new_user_values(tg_id, name, username, True),
+        lambda excluded: {"name": excluded.name, "username": excluded.username}
+    )
 
 
 async def get_user(tg_id: int):
+    user = user_cache.get(tg_id)
+    if user is not None:
+        return user
+
     async with async_session() as session:
-        return await session.scalar(select(User).where(User.tg_id == tg_id))
+        user = await session.scalar(select(User).where(User.tg_id == tg_id))
+    if user is not None:
+        user_cache.put(user)
+    return user
     
 
 async def subscribe_user(tg_id: int, name: str, username: str | None = None) -> User:
@@ -80,11 +150,21 @@ async def subscribe_user(tg_id: int, name: str, username: str | None = None) ->
     )
 
 async def unsubscribe_user(tg_id: int) -> User | None:
-    """Отписать пользователя от уведомлений"""
-    return await set_user(
-        tg_id=tg_id, 
-        is_subscribed=False
-    )
+    """
+    Отписать пользователя от уведомлений. Только UPDATE: для чатов, которых нет
+    среди пользователей (админ-группа, неизвестный id), ничего не создаётся.
+    """
+    async with async_session() as session:
+        user = await session.scalar(
+            update(User)
+            .where(User.tg_id == tg_id)
+            .values(is_subscribed=False, subscribed_at=None)
+            .returning(User)
+        )
+        await session.commit()
+    if user is not None:
+        user_cache.put(user)
+    return user
 
 async def get_subscribed_users() -> list[User]:
     """Получить всех подписанных пользователей"""
@@ -102,19 +182,60 @@ async def get_all_users() -> list[User]:
         return result.scalars().all()
 
 
-async def is_server_running(retries=2, delay=1):
+async def _probe_server_status(retries=2, delay=1) -> ServerState:
     for attempt in range(retries):
         try:
-            server = await JavaServer.async_lookup(f"{config.mc_host.get_secret_value()}:{config.mc_port}")
+            host, port = await resolver.resolve_minecraft(config.mc_host.get_secret_value(), config.mc_port)
+            server = JavaServer(host, port)
             status = await asyncio.wait_for(server.async_status(), timeout=2.0)
-            return True
-        except (socket.gaierror, ConnectionRefusedError, asyncio.TimeoutError):
+            return ServerState(
+                online=True,
+                latency_ms=status.latency,
+                players_online=status.players.online,
+                players_max=status.players.max,
+                version=status.version.name,
+                motd=status.motd.to_plain()
+            )
+        except (ResolveError, ConnectionRefusedError, OSError, asyncio.TimeoutError):
             if attempt == retries - 1:
-                return False
+                return ServerState(online=False)
             await asyncio.sleep(delay)
         except Exception as e:
             logging.error(f"Server check error: {e}")
-            return False
+            return ServerState(online=False)
+
+
+async def probe_server_status(retries=2, delay=1) -> ServerState:
+    started = time.perf_counter()
+    state = await _probe_server_status(retries, delay)
+    STATUS_PROBE_SECONDS.observe(time.perf_counter() - started, result="online" if state.online else "offline")
+    return state
+
+
+status_monitor = StatusMonitor(probe_server_status)
+
+log_source = build_log_source(config.log_source, config, ssh=ssh)
+
+broadcaster = Broadcaster(on_blocked=unsubscribe_user)
+
+outbox = Outbox(async_session, broadcaster)
+
+
+async def send_to_admin(text: str):
+    await outbox.enqueue(config.admin_id, text)
+
+
+admin_digest = DigestAggregator(
+    send=send_to_admin,
+    policies=config.digest_policies,
+    window=config.digest_window,
+    max_events=config.digest_max_events
+)
+
+
+async def is_server_running() -> bool:
+    """Последний известный статус сервера из общего монитора, без сетевых запросов."""
+    return await status_monitor.is_online()
     
 
 async def ping_loop(bot: Bot):
@@ -122,8 +243,8 @@ async def ping_loop(bot: Bot):
     failure_count = 0
     success_count = 0
 
-    while True:
-        is_up = await is_server_running()
+    async for server_state in status_monitor.updates():
+        is_up = server_state.online
 
         if is_up:
             success_count += 1
@@ -136,102 +257,56 @@ async def ping_loop(bot: Bot):
             if success_count >= 3 and state != "up":
                 # Сервер поднялся — рассылаем уведомления подписанным
                 subscribed_users = await get_subscribed_users()
-                for user in subscribed_users:
-                    await bot.send_message(user.tg_id, "✅ Minecraft сервер запущен!")
+                await broadcaster.broadcast(bot, [user.tg_id for user in subscribed_users], "✅ Minecraft сервер запущен!")
                 state = "up"
         else:
             if failure_count >= 3 and state != "down":
                 # Сервер упал — рассылаем уведомления подписанным
                 subscribed_users = await get_subscribed_users()
-                for user in subscribed_users:
-                    await bot.send_message(user.tg_id, "⚠️ Minecraft сервер остановлен!")
+                await broadcaster.broadcast(bot, [user.tg_id for user in subscribed_users], "⚠️ Minecraft сервер остановлен!")
                 state = "down"
 
-        await asyncio.sleep(10) 
+
+server_stats = ServerStatsService(rcon_pool.run_command)
+
+
+async def fetch_server_stats() -> ServerStats:
+    """Онлайн и TPS сервера (снимок на несколько секунд, общий для всех пользователей)."""
+    return await server_stats.get()
 
 
-def get_server_stats(host: str, port: int, password: str) -> str:
+async def get_server_stats() -> str:
     """
     Возвращает строку с текущей статистикой сервера Minecraft по RCON.
     """
     try:
-        with MCRcon(host, password, port=port) as mcr:
-            # Получаем список игроков
-            list_resp = mcr.command("list")
-
-            # Пробуем получить TPS (если поддерживается)
-            try:
-                tps_resp = mcr.command("tps")
-            except Exception:
-                tps_resp = "TPS недоступен."
-
-            # Собираем всё
-            stats_text = (
-                "📊 Статистика сервера:\n\n"
-                f"👥 Онлайн:\n{list_resp}\n\n"
-                f"⚙️ TPS:\n{tps_resp}\n"
-            )
-
-            return stats_text
+        return (await fetch_server_stats()).render()
     except Exception as e:
         return f"❌ Не удалось получить статистику:\n{e}"
     
 
-def run_rcon_command(command: str, retries=3, delay=2):
-    for attempt in range(retries):
-        try:
-            with MCRcon(config.mc_host.get_secret_value(), config.rcon_pass.get_secret_value(), config.rcon_port) as mcr:
-                return mcr.command(command)
-        except (ConnectionRefusedError, socket.error, EOFError) as e:
-            logging.warning(f"RCON attempt {attempt + 1} failed: {e}")
-            if attempt == retries - 1:
-                raise
-            time.sleep(delay)
-        except Exception as e:
-            logging.error(f"Unexpected RCON error: {e}")
-            raise
+async def run_rcon_command(command: str, retries=3, delay=2):
+    return await rcon_pool.run_command(command, retries=retries, delay=delay)
     
 
 async def run_rcon_command2(command: str):
     try:
-        client = RconClient(
-            host=config.mc_host.get_secret_value(),
-            port=config.rcon_port,
-            password=config.rcon_pass.get_secret_value()
-        )
-        client.connect()
-        result = await client.run_command_async(command)
-        client.disconnect()
-        return result
+        return await rcon_pool.run_command(command)
     except Exception as e:
         return f"Ошибка RCON: {e}"
     
 
-def run_ssh_command(
-    command: str,
-    host=config.mc_host.get_secret_value(),
-    port=config.ssh_port,
-    user=config.ssh_user.get_secret_value(),
-    password=config.ssh_pass.get_secret_value()
-):
+async def run_ssh_command(command: str, timeout=30):
     try:
-        client = paramiko.SSHClient()
-        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-
-        client.connect(hostname=host, port=port, username=user, password=password)
-
-        stdin, stdout, stderr = client.exec_command(command)
-        out = stdout.read().decode()
-        err = stderr.read().decode()
-
-        client.close()
-
-        if err:
-            return f"❌ Ошибка при выполнении команды:\n{err.strip()}"
-        return out.strip() if out.strip() else "✅ Команда выполнена, но вывода нет."
-
+        result = await ssh.run(command, timeout=timeout)
+    except asyncio.TimeoutError:
+        return f"❌ Команда не завершилась за {timeout} с"
     except Exception as e:
         return f"❌ SSH-подключение не удалось: {e}"
+
+    if result.stderr.strip():
+        return f"❌ Ошибка при выполнении команды:\n{result.stderr.strip()}"
+    return result.stdout.strip() if result.stdout.strip() else "✅ Команда выполнена, но вывода нет."
     
 
 async def get_last_death_location(mc_name: str) -> str | None:
@@ -244,20 +319,23 @@ async def get_last_death_location(mc_name: str) -> str | None:
     return None
     
 
-async def get_telegram_id_by_mc_name(mc_name: str) -> int | None:
+async def load_nick_registry():
     async with async_session() as session:
-        stmt = select(User).where(User.mc_name == mc_name)
-        result = await session.execute(stmt)
-        user = result.scalar_one_or_none()
-        if user:
-            return user.tg_id
-        return None
+        result = await session.execute(select(User.tg_id, User.mc_name).where(User.mc_name.is_not(None)))
+        nick_registry.load(result.all())
+    logging.info(f"Загружено ников: {len(nick_registry)}")
+
+
+async def get_telegram_id_by_mc_name(mc_name: str) -> int | None:
+    if not nick_registry.loaded:
+        await load_nick_registry()
+    return nick_registry.get_tg_id(mc_name)
     
 
-async def notify_player_death(mc_name: str, death_reason: str):
+async def notify_player_death(mc_name: str, death_reason: str, occurred_at: datetime | None = None):
     tg_id = await get_telegram_id_by_mc_name(mc_name)
     if not tg_id:
-        await bot.send_message(config.admin_id, f"💀 Игрок {mc_name} умер, Telegram ID не найден.")
+        await admin_digest.add("death", f"💀 Игрок {mc_name} умер, Telegram ID не найден.")
         return
     
     coords = await get_last_death_location(mc_name)
@@ -266,143 +344,231 @@ async def notify_player_death(mc_name: str, death_reason: str):
     if coords:
         text += f"\nКоординаты смерти: {coords}"
     
-    await bot.send_message(tg_id, text)
+    await outbox.enqueue(tg_id, text, created_at=occurred_at)
 
     admin_text = f"💀 Умер {mc_name}."
     if coords:
         admin_text += f" Координаты: {coords}"
-    await bot.send_message(config.admin_id, admin_text)
+    await admin_digest.add("death", admin_text)
 
 
-async def process_log_line(line: str):
-    global processed_lines
-
-    if line in processed_lines:
-        return
-    
-    processed_lines.add(line)
-
-    if len(processed_lines) > MAX_CACHE_SIZE:
-        processed_lines.pop()
-
-    if 'Saved the game' in line:
+async def process_log_line(line: str, cursor: str | None = None):
+    if line_dedup.seen(line, cursor):
         return
 
-    match = re.search(r'\]: ([^\s]+) joined the game', line)
-    if match:
-        player = match.group(1)
-        logging.info(f"🟢 Игрок {player} подключился к серверу!")
-        await bot.send_message(config.admin_id, f"🟢 Игрок {player} подключился к серверу!")
+    event = classifier.classify(line)
+    if event is None:
         return
 
-    match_leave = re.search(r'\]: ([^\s]+) left the game', line)
-    if match_leave:
-        player = match_leave.group(1)
-        logging.info(f"🔴 Игрок {player} вышел с сервера!")
-        await bot.send_message(config.admin_id, f"🔴 Игрок {player} вышел с сервера!")
-        return
+    occurred_at = cursor_time(cursor)
+    if occurred_at is not None:
+        LOG_EVENT_LAG.observe((datetime.utcnow() - occurred_at).total_seconds(), kind=event.kind)
+
+    if event.kind in ("join", "leave"):
+        # Список онлайна в снимке статистики сервера больше не верен
+        server_stats.invalidate()
+
+    if event.kind == "join":
+        logging.info(f"🟢 Игрок {event.player} подключился к серверу!")
+        await admin_digest.add("join", f"🟢 Игрок {event.player} подключился к серверу!")
+    elif event.kind == "leave":
+        logging.info(f"🔴 Игрок {event.player} вышел с сервера!")
+        await admin_digest.add("leave", f"🔴 Игрок {event.player} вышел с сервера!")
+    elif event.kind == "rcon":
+        logging.info(f"⚙️ RCON: {event.text}")
+        await admin_digest.add("rcon", f"⚙️ RCON: {event.text}")
+    elif event.kind == "chat":
+        logging.info(f"💬 {event.player}: {event.text}")
+        await admin_digest.add("chat", f"💬 {event.player}: {event.text}")
+    elif event.kind == "death":
+        logging.info(f"💀 Игрок {event.player} умер! Причина: {event.text}")
+        await notify_player_death(event.player, event.text, occurred_at)
     
-    rcon_match = re.search(r'\[Not Secure\] \[Rcon\] (.+)', line)
-    if rcon_match:
-        command = rcon_match.group(1)
-        logging.info(f"⚙️ RCON: {command}")
-        await bot.send_message(config.admin_id, f"⚙️ RCON: {command}")
-        return
-    
-    match_chat_alt = re.search(r'\[Not Secure\] <([^>]+)> (.+)', line)
-    if match_chat_alt:
-        player = match_chat_alt.group(1)
-        message = match_chat_alt.group(2)
 
-        logging.info(f"💬 {player}: {message}")
-        await bot.send_message(config.admin_id, f"💬 {player}: {message}")
-        return
-    
-    match_chat = re.search(r'\]: ([^\s]+): (.+)', line)
-    if match_chat:
-        player = match_chat.group(1)
-        message = match_chat.group(2)
-        
-        logging.info(f"💬 {player}: {message}")
-        await bot.send_message(config.admin_id, f"💬 {player}: {message}")
-        return
-    
-    for pattern in cs.death_patterns:
-        if pattern in line:
-            player_match = re.search(r'\]: \[\d{2}:\d{2}:\d{2} INFO\]: (\S+)', line)
-            player = player_match.group(1) if player_match else "Игрок"
+async def get_bot_state(key: str) -> str | None:
+    async with async_session() as session:
+        return await session.scalar(select(BotState.value).where(BotState.key == key))
 
-            if player is None:
-                logging.warning("Не смогли распарсить ник умершего игрока из лога.")
-                return
 
-            logging.info(f"💀 Игрок {player} умер! Причина: {pattern}")
+async def set_bot_state(key: str, value: str):
+    stmt = upsert(engine, BotState).values(key=key, value=value)
+    stmt = stmt.on_conflict_do_update(index_elements=[BotState.key], set_={"value": stmt.excluded.value})
+    async with async_session() as session:
+        await session.execute(stmt)
+        await session.commit()
 
-            await notify_player_death(player, pattern)
 
-            return
-    
+async def update_mc_name(tg_id: int, mc_name: str) -> bool:
+    """Сохранить ник; False, если он уже занят другим пользователем."""
+    if not nick_registry.loaded:
+        await load_nick_registry()
+    owner = nick_registry.get_tg_id(mc_name)
+    if owner is not None and owner != tg_id:
+        return False
+    previous = nick_registry.get_mc_name(tg_id)
+    if previous == mc_name:
+        # Тот же ник — в базу не ходим
+        return True
 
-def ssh_log_reader(host, port, user, password, queue: asyncio.Queue, loop: asyncio.AbstractEventLoop):
-    while True:
-        client = None
+    async with async_session() as session:
+        stmt = update(User).where(User.tg_id == tg_id).values(mc_name=mc_name).returning(User)
         try:
-            client = paramiko.SSHClient()
-            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            client.connect(
-                hostname=host,
-                port=port,
-                username=user,
-                password=password,
-                timeout=10
-            )
-            stdin, stdout, stderr = client.exec_command("journalctl -u minecraft -f --no-tail")
+            user = await session.scalar(stmt)
+            await session.commit()
+        except IntegrityError:
+            # Ник занят в базе, хотя реестр считал его свободным: базу правили в обход бота
+            user_cache.invalidate(tg_id)
+            return False
 
-            for line in iter(stdout.readline, ""):
-                if line:
-                    asyncio.run_coroutine_threadsafe(queue.put(line.strip()), loop)
+    if user is None:
+        # Строки нет — пользователя удалили из базы, закэшированная копия устарела
+        user_cache.invalidate(tg_id)
+    else:
+        nick_registry.set(tg_id, mc_name)
+        user_cache.put(user)
+        # В кэше может лежать снимок из базы, сохранённый до привязки; /my_stat запросит свежий
+        stats_cache.invalidate(mc_name)
+        if previous is not None:
+            stats_cache.invalidate(previous)
+    return True
+
+
+async def get_scoreboard_stat(mc_name: str, objective: str) -> int | str:
+    stats = await stats_cache.get(mc_name)
+    if stats is None:
+        return NO_DATA
+    return stats.get(objective)
 
-        except Exception as e:
-            logging.error(f"SSH error: {e}")
-            asyncio.run_coroutine_threadsafe(queue.put(f"❌ SSH error: {e}"), loop)
-        finally:
-            if client:
-                client.close()
-            time.sleep(5) 
 
+async def fetch_players_stats(mc_names: list[str], objectives: list[str] = cs.OBJECTIVES) -> dict[str, PlayerStats]:
+    """
+    Получить все цели табло для нескольких игроков одной пачкой RCON-команд.
 
-async def update_mc_name(tg_id: int, mc_name: str):
+    Запросы уходят по одному соединению без ожидания друг друга и
+    сопоставляются с ответами по id пакета.
+    """
+    commands = [scoreboard_get_command(name, obj) for name in mc_names for obj in objectives]
+    outputs = await rcon_pool.run_batch(commands)
+
+    fetched_at = stats_now()
+    result = {name: PlayerStats(name, updated_at=fetched_at) for name in mc_names}
+    it = iter(outputs)
+    for name in mc_names:
+        for obj in objectives:
+            result[name].values[obj] = parse_scoreboard_value(next(it))
+    return result
+
+
+async def save_players_snapshot(stats_list: list[PlayerStats]):
+    """Сохранить снимок статистики в базу (upsert по нику без учёта регистра и цели)."""
+    now = stats_now()
+    # Разные написания одного ника в пачке — одна строка, иначе upsert заденет её дважды
+    rows = {}
+    for stats in stats_list:
+        for obj, val in stats.values.items():
+            if isinstance(val, int):
+                value = val
+            elif val == NO_DATA:
+                value = None
+            else:
+                continue
+            rows[stats.mc_name.lower(), obj] = {
+                "mc_key": stats.mc_name.lower(),
+                "mc_name": stats.mc_name,
+                "objective": obj,
+                "value": value,
+                "updated_at": now
+            }
+    if not rows:
+        return
+
+    stmt = upsert(engine, ScoreSnapshot).values(list(rows.values()))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ScoreSnapshot.mc_key, ScoreSnapshot.objective],
+        set_={"mc_name": stmt.excluded.mc_name, "value": stmt.excluded.value, "updated_at": stmt.excluded.updated_at}
+    )
     async with async_session() as session:
-        stmt = update(User).where(User.tg_id == tg_id).values(mc_name=mc_name)
         await session.execute(stmt)
         await session.commit()
 
 
-async def get_scoreboard_stat(mc_name: str, objective: str) -> int | str:
-    command = f"scoreboard players get {mc_name} {objective}"
-    output = await run_rcon_command2(command)
+async def load_player_snapshot(mc_name: str) -> PlayerStats | None:
+    """Последний сохранённый снимок статистики игрока."""
+    async with async_session() as session:
+        result = await session.execute(
+            select(ScoreSnapshot).where(ScoreSnapshot.mc_key == mc_name.lower())
+        )
+        rows = result.scalars().all()
 
-    print(f"RCON ответ: {output}")
+    if not rows:
+        return None
 
-    if "Can't get value" in output or "none is set" in output:
-        return "Пока нет данных"
+    stats = PlayerStats(mc_name, updated_at=max(row.updated_at for row in rows))
+    for row in rows:
+        stats.values[row.objective] = row.value if row.value is not None else NO_DATA
+    return stats
 
-    match = re.search(r"has (\d+)", output)
-    if match:
-        return int(match.group(1))
-    return "Неизвестный формат ответа"
 
+async def get_known_mc_names() -> list[str]:
+    """Ники для снимка: все игроки в табло сервера плюс ники, указанные пользователями бота."""
+    async with async_session() as session:
+        result = await session.execute(select(User.mc_name).where(User.mc_name.is_not(None)).distinct())
+        names = list(result.scalars().all())
 
-async def get_player_stats(mc_name: str) -> str:
-    stats_lines = [f"Статистика игрока <b>{mc_name}</b>:"]
+    try:
+        tracked = parse_tracked_players(await rcon_pool.run_command("scoreboard players list", retries=1))
+    except Exception as e:
+        logging.warning(f"[stats] Не удалось получить список игроков табло: {e}")
+        tracked = []
 
-    for obj in cs.OBJECTIVES:
-        ru_name = cs.OBJECTIVES_RU.get(obj.lower(), obj) 
-        val = await get_scoreboard_stat(mc_name, obj)
+    seen = {name.lower() for name in tracked}
+    return tracked + [name for name in names if name.lower() not in seen]
 
-        if obj == "walk_km" and isinstance(val, int):
-            val = f"{val / 1000:.2f}"
 
-        stats_lines.append(f"• {ru_name}: {val}")
+async def get_leaderboard(objective: str, limit: int = 10) -> list[tuple[str, int]]:
+    """Топ игроков по цели табло из последнего снимка."""
+    async with async_session() as session:
+        result = await session.execute(
+            select(ScoreSnapshot.mc_name, ScoreSnapshot.value)
+            .where(ScoreSnapshot.objective == objective, ScoreSnapshot.value.is_not(None))
+            .order_by(ScoreSnapshot.value.desc())
+            .limit(limit)
+        )
+        return [(name, value) for name, value in result.all()]
+
+
+async def get_player_rank(objective: str, mc_name: str) -> tuple[int, int] | None:
+    """Место игрока и его значение по цели табло; None, если данных нет."""
+    async with async_session() as session:
+        value = await session.scalar(
+            select(ScoreSnapshot.value)
+            .where(ScoreSnapshot.objective == objective, ScoreSnapshot.mc_key == mc_name.lower())
+        )
+        if value is None:
+            return None
+
+        higher = await session.scalar(
+            select(func.count())
+            .select_from(ScoreSnapshot)
+            .where(ScoreSnapshot.objective == objective, ScoreSnapshot.value > value)
+        )
+        return higher + 1, value
+
+
+stats_cache = StatsCache(
+    fetch=fetch_players_stats,
+    load=load_player_snapshot,
+    save=save_players_snapshot,
+    known_names=get_known_mc_names
+)
 
-    return "\n".join(stats_lines)
\ No newline at end of file
+
+async def fetch_player_stats(mc_name: str, online=True) -> PlayerStats | None:
+    return await stats_cache.get(mc_name, online=online)
+
+
+async def get_player_stats(mc_name: str) -> str:
+    stats = await fetch_player_stats(mc_name)
+    if stats is None:
+        return cs.none_text
+    return "\n".join([f"Статистика игрока <b>{mc_name}</b>:", *stats.render_lines()])
@@ -13,6 +13,8 @@ from config import config
 import app.keyboards as kb
 import app.database.requests as rq
 import app.text as cs
+from app.database.models import User
+from app.utils.player_stats import format_value, stats_now
 
 
 logging.basicConfig(level=logging.INFO)
@@ -25,11 +27,6 @@ class MCNameState(StatesGroup):
 # Хэндлер на команду /start
 @router.message(CommandStart())
 async def start(message: Message):
-    user = message.from_user
-    existing_user = await rq.get_user(user.id)
-
-    if not existing_user:
-        await rq.set_user(user.id, user.full_name, user.username, is_subscribed=True)
     await message.answer(
         text=cs.welcome_text, 
         parse_mode="HTML",
@@ -50,21 +47,17 @@ async def back_to_main(callback: CallbackQuery, state: FSMContext):
 async def show_status(callback: CallbackQuery):
     online = await rq.is_server_running()
     status = "🟢 Сервер работает!" if online else "🔴 Сервер не работает"
+    state = rq.status_monitor.state
+    if online and state:
+        status += f"\nОнлайн: {state.players_online}/{state.players_max}"
     await callback.answer(status)
 
 
 @router.callback_query(F.data == "server_control")
-async def show_settings(callback: CallbackQuery):
-    user = callback.from_user
-    existing_user = await rq.get_user(user.id)
-
-    if not existing_user:
-        await rq.set_user(user.id, user.full_name, user.username, is_subscribed=True) 
-        existing_user = await rq.get_user(user.id)
-
+async def show_settings(callback: CallbackQuery, user: User):
     text = (
         "🔔 <b>Управление уведомлениями сервера</b>\n\n"
-        f"Текущий статус: {'✅ Подписаны' if existing_user and existing_user.is_subscribed else '❌ Не подписаны'}\n\n"
+        f"Текущий статус: {'✅ Подписаны' if user.is_subscribed else '❌ Не подписаны'}\n\n"
         "Получать уведомления при:\n"
         "• Запуске/остановке сервера\n"
         "• Изменении статуса\n"
@@ -72,7 +65,7 @@ async def show_settings(callback: CallbackQuery):
     )
 
     builder = InlineKeyboardBuilder()
-    if user and existing_user.is_subscribed:
+    if user.is_subscribed:
         builder.button(text="🔕 Отписаться", callback_data="unsubscribe_notifications")
     else:
         builder.button(text="🔔 Подписаться", callback_data="subscribe_notifications")
@@ -139,7 +132,7 @@ async def server_stats(callback: CallbackQuery):
     is_up = await rq.is_server_running()
 
     if is_up:
-        stats = rq.get_server_stats(host=config.mc_host.get_secret_value(), port=config.rcon_port, password=config.rcon_pass.get_secret_value())
+        stats = await rq.get_server_stats()
 
         await callback.message.edit_text(
             text=stats,
@@ -150,13 +143,7 @@ async def server_stats(callback: CallbackQuery):
 
 
 @router.callback_query(F.data == "my_stat")
-async def handle_my_stat(callback: CallbackQuery, state: FSMContext):
-    user = await rq.get_user(callback.from_user.id)
-
-    if not user:
-        await rq.set_user(callback.from_user.id, callback.from_user.full_name, callback.from_user.username)
-        user = await rq.get_user(callback.from_user.id)
-
+async def handle_my_stat(callback: CallbackQuery, state: FSMContext, user: User):
     if not user.mc_name:
         await callback.message.edit_text("❗ У тебя не указан ник Minecraft.\n\nВведи его сейчас:")
         await state.set_state(MCNameState.waiting_for_mc_name)
@@ -164,23 +151,22 @@ async def handle_my_stat(callback: CallbackQuery, state: FSMContext):
         await callback.message.edit_text("⏳ Загружаю вашу статистику...")
 
         is_up = await rq.is_server_running()
+        stats = await rq.fetch_player_stats(user.mc_name, online=is_up)
 
-        if is_up:
-            stats = await rq.get_player_stats(user.mc_name)
-            await callback.message.edit_text(f"📊 Статистика игрока <b>{user.mc_name}</b>:\n\n{stats}", parse_mode="HTML",reply_markup=kb.ower_stat_menu)
-        else:
+        if stats is None:
             await callback.message.edit_text(text=cs.none_text, parse_mode="HTML",reply_markup=kb.back_to_main)
+            return
+
+        text = f"📊 Статистика игрока <b>{user.mc_name}</b>:\n\n{stats.render()}"
+        # Время показывается, когда данные не с живого сервера: он выключен или отдан старый снимок
+        stale = stats.updated_at and (stats_now() - stats.updated_at).total_seconds() >= rq.stats_cache.ttl
+        if stats.updated_at and (not is_up or stale):
+            text += f"\n\n<i>Данные на {stats.updated_at:%d.%m.%Y %H:%M}</i>"
+        await callback.message.edit_text(text, parse_mode="HTML",reply_markup=kb.ower_stat_menu)
 
 
 @router.callback_query(F.data == "reverse_nik")
 async def reverse_nik(callback: CallbackQuery, state: FSMContext):
-    user = callback.from_user
-    existing_user = await rq.get_user(user.id)
-
-    if not existing_user:
-        await rq.set_user(user.id, user.full_name, user.username, is_subscribed=True) 
-        existing_user = await rq.get_user(user.id)
-
     await callback.message.edit_text("❗ Введи новый ник:",reply_markup=kb.back_to_main)
     await state.set_state(MCNameState.waiting_for_mc_name)
 
@@ -189,7 +175,9 @@ async def reverse_nik(callback: CallbackQuery, state: FSMContext):
 async def process_mc_name_input(message: Message, state: FSMContext):
     mc_name = message.text.strip()
 
-    await rq.update_mc_name(message.from_user.id, mc_name)
+    if not await rq.update_mc_name(message.from_user.id, mc_name):
+        await message.answer(f"❌ Ник <b>{mc_name}</b> уже указан другим пользователем. Введи другой:", parse_mode="HTML")
+        return
     await state.clear()
 
     await message.answer(f"✅ Ник <b>{mc_name}</b> сохранён!\n\nТеперь ты можешь снова нажать «🥇 Моя статистика»", parse_mode="HTML",reply_markup=kb.stat_menu)
@@ -210,10 +198,36 @@ async def about(callback: CallbackQuery):
     
 
 @router.callback_query(F.data == "top_stat")
-async def about(callback: CallbackQuery):
+async def top_stat(callback: CallbackQuery):
     await callback.message.edit_text(
         text=cs.top_text, parse_mode="HTML",
-        reply_markup=kb.back_to_stat)
+        reply_markup=kb.top_menu)
+
+
+@router.callback_query(F.data.startswith("top:"))
+async def top_objective(callback: CallbackQuery, user: User):
+    objective = callback.data.split(":", 1)[1]
+    if objective not in cs.OBJECTIVES:
+        await callback.answer()
+        return
+
+    leaders = await rq.get_leaderboard(objective)
+    if not leaders:
+        await callback.message.edit_text(text=cs.top_empty_text, parse_mode="HTML", reply_markup=kb.back_to_top)
+        return
+
+    medals = {1: "🥇", 2: "🥈", 3: "🥉"}
+    lines = [f"🏆 <b>Топ: {cs.OBJECTIVES_RU.get(objective, objective)}</b>\n"]
+    for place, (mc_name, value) in enumerate(leaders, start=1):
+        lines.append(f"{medals.get(place, f'{place}.')} {mc_name} — {format_value(objective, value)}")
+
+    if user.mc_name:
+        rank = await rq.get_player_rank(objective, user.mc_name)
+        if rank:
+            place, value = rank
+            lines.append(f"\nТвоё место: <b>{place}</b> ({format_value(objective, value)})")
+
+    await callback.message.edit_text(text="\n".join(lines), parse_mode="HTML", reply_markup=kb.back_to_top)
 
 
 @router.message()
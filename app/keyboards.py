@@ -1,6 +1,8 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
+import app.text as cs
+
 
 main_menu = InlineKeyboardMarkup(inline_keyboard=[
     [
@@ -41,4 +43,21 @@ ower_stat_menu = InlineKeyboardMarkup(inline_keyboard=[
     [InlineKeyboardButton(text="📊 Статистика", callback_data="server_stats")],
     [InlineKeyboardButton(text="⚙️ Поменять ник", callback_data="reverse_nik")],
     [InlineKeyboardButton(text="🔙 Назад в меню", callback_data="back_to_main")]
-])
\ No newline at end of file
+])
+
+
+def build_top_menu() -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    for obj in cs.OBJECTIVES:
+        builder.button(text=cs.OBJECTIVES_RU.get(obj, obj), callback_data=f"top:{obj}")
+    builder.button(text="🔙 Назад в статистику", callback_data="server_stats")
+    builder.adjust(2)
+    return builder.as_markup()
+
+
+top_menu = build_top_menu()
+
+
+back_to_top = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="🔙 Назад к топам", callback_data="top_stat")]
+])
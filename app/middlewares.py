@@ -0,0 +1,56 @@
+import time
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+import app.database.requests as rq
+from app.utils.metrics import metrics
+
+
+HANDLER_SECONDS = metrics.histogram("handler_seconds", "Обработка апдейта, от middleware до ответа обработчика", ["handler"])
+HANDLER_ERRORS = metrics.counter("handler_errors_total", "Исключения в обработчиках", ["handler"])
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """Время и ошибки каждого обработчика; регистрируется первым, чтобы учитывать и остальные middleware."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any]
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = handler_object.callback.__name__ if handler_object is not None else "unknown"
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(handler=name)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - started, handler=name)
+
+
+class UserMiddleware(BaseMiddleware):
+    """
+    Пользователь из базы для каждого апдейта, доступный обработчикам как аргумент `user`.
+
+    Берётся из кэша; в базу идёт один upsert, только если пользователя там ещё
+    нет (или запись в кэше устарела) либо он сменил имя или username в Telegram.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any]
+    ) -> Any:
+        from_user = data.get("event_from_user")
+        if from_user is not None:
+            user = rq.user_cache.get(from_user.id)
+            if user is None or user.name != from_user.full_name or user.username != from_user.username:
+                user = await rq.upsert_user(from_user.id, from_user.full_name, from_user.username)
+            data["user"] = user
+        return await handler(event, data)
@@ -38,7 +38,14 @@ help_text = """
 
 
 top_text = """
-🥇 Топы сервера и многое другое, ожидайте в новых обновлениях.
+🥇 <b>Топы сервера</b>
+
+Выберите категорию:
+"""
+
+
+top_empty_text = """
+🥇 Топ пока пуст — статистика ещё не собрана, загляните позже.
 """
 
 
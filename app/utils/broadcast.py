@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramNetworkError, TelegramRetryAfter
+
+from app.utils.metrics import metrics
+
+
+TELEGRAM_SEND_SECONDS = metrics.histogram("telegram_send_seconds", "Время успешного вызова sendMessage")
+TELEGRAM_FLOOD_WAITS = metrics.counter("telegram_flood_waits_total", "Ответы 429 Too Many Requests от Telegram")
+TELEGRAM_SEND_ERRORS = metrics.counter("telegram_send_errors_total", "Неудачные отправки сообщений", ["error"])
+
+
+class TokenBucket:
+    """Ограничитель частоты: не больше `rate` событий в секунду со всплеском до `capacity`."""
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass
+class BroadcastResult:
+    total: int = 0
+    sent: int = 0
+    failed: int = 0
+    blocked: int = 0
+    retries: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    finished_at: float | None = None
+
+    @property
+    def duration(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def rate(self) -> float:
+        return self.sent / self.duration if self.duration > 0 else 0.0
+
+
+class Broadcaster:
+    """
+    Рассылка сообщений с учётом лимитов Telegram.
+
+    Общий лимит — `global_rate` сообщений в секунду на бота, в личный чат — не
+    чаще раза в `per_chat_interval` секунд, в группу (отрицательный id) — раза
+    в `group_chat_interval` секунд (Telegram пускает в группу около 20 сообщений
+    в минуту). На RetryAfter на указанное Telegram время откладывается только
+    этот чат, остальные получатели его не ждут. Пользователи, заблокировавшие
+    бота, передаются в `on_blocked` (отписка от уведомлений).
+    """
+
+    def __init__(self, global_rate=25.0, per_chat_interval=1.0, group_chat_interval=3.0, concurrency=16,
+                 max_retries=3, progress_every=100, on_blocked=None):
+        self.limiter = TokenBucket(global_rate)
+        self.per_chat_interval = per_chat_interval
+        self.group_chat_interval = group_chat_interval
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.progress_every = progress_every
+        self.on_blocked = on_blocked
+
+        self._chat_next_send: dict[int, float] = {}
+
+    async def _wait_chat(self, chat_id: int):
+        now = time.monotonic()
+        if len(self._chat_next_send) > 10000:
+            self._chat_next_send = {k: v for k, v in self._chat_next_send.items() if v > now}
+        interval = self.group_chat_interval if chat_id < 0 else self.per_chat_interval
+        next_send = self._chat_next_send.get(chat_id, 0.0)
+        self._chat_next_send[chat_id] = max(now, next_send) + interval
+        if next_send > now:
+            await asyncio.sleep(next_send - now)
+
+    def _pause_chat(self, chat_id: int, seconds: float):
+        """RetryAfter для чата: следующая отправка в него не раньше чем через `seconds`."""
+        resume_at = time.monotonic() + seconds
+        self._chat_next_send[chat_id] = max(self._chat_next_send.get(chat_id, 0.0), resume_at)
+
+    async def send(self, bot: Bot, chat_id: int, text: str, result: BroadcastResult | None = None, **kwargs) -> bool:
+        """Отправить одно сообщение с соблюдением лимитов; False, если доставить не удалось."""
+        for attempt in range(self.max_retries + 1):
+            await self._wait_chat(chat_id)
+            await self.limiter.acquire()
+            started = time.perf_counter()
+            try:
+                await bot.send_message(chat_id, text, **kwargs)
+                TELEGRAM_SEND_SECONDS.observe(time.perf_counter() - started)
+                if result is not None:
+                    result.sent += 1
+                return True
+            except TelegramRetryAfter as e:
+                TELEGRAM_FLOOD_WAITS.inc()
+                logging.warning(f"[broadcast] Flood limit в чате {chat_id}, пауза {e.retry_after} с")
+                self._pause_chat(chat_id, e.retry_after)
+            except TelegramForbiddenError:
+                TELEGRAM_SEND_ERRORS.inc(error="forbidden")
+                logging.info(f"[broadcast] Пользователь {chat_id} заблокировал бота")
+                if result is not None:
+                    result.blocked += 1
+                if self.on_blocked:
+                    try:
+                        await self.on_blocked(chat_id)
+                    except Exception as e:
+                        logging.error(f"[broadcast] Не удалось отписать {chat_id}: {e}")
+                return False
+            except TelegramNetworkError as e:
+                TELEGRAM_SEND_ERRORS.inc(error="network")
+                logging.warning(f"[broadcast] Сетевая ошибка при отправке {chat_id}: {e}")
+                await asyncio.sleep(min(2 ** attempt, 30))
+            except Exception as e:
+                TELEGRAM_SEND_ERRORS.inc(error=type(e).__name__)
+                logging.error(f"[broadcast] Не удалось отправить сообщение {chat_id}: {e}")
+                break
+            if result is not None:
+                result.retries += 1
+
+        if result is not None:
+            result.failed += 1
+        return False
+
+    async def broadcast(self, bot: Bot, chat_ids: list[int], text: str, **kwargs) -> BroadcastResult:
+        result = BroadcastResult(total=len(chat_ids))
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def worker(chat_id: int):
+            async with semaphore:
+                await self.send(bot, chat_id, text, result=result, **kwargs)
+            done = result.sent + result.failed + result.blocked
+            if self.progress_every and done % self.progress_every == 0:
+                logging.info(f"[broadcast] {done}/{result.total}, {result.rate:.1f} сообщ./с")
+
+        await asyncio.gather(*(worker(chat_id) for chat_id in chat_ids))
+        result.finished_at = time.monotonic()
+        logging.info(
+            f"[broadcast] Рассылка завершена: отправлено {result.sent}/{result.total}, "
+            f"заблокировали {result.blocked}, ошибок {result.failed}, повторов {result.retries}, "
+            f"{result.duration:.1f} с ({result.rate:.1f} сообщ./с)"
+        )
+        return result
@@ -0,0 +1,42 @@
+import hashlib
+from collections import OrderedDict
+
+
+class LineDeduplicator:
+    """
+    Отсев повторно прочитанных строк лога.
+
+    Ключ — курсор journald, если он известен, иначе хэш строки целиком (в строке
+    журнала есть отметка времени, поэтому одинаковые сообщения в разное время
+    не склеиваются). Хранит `max_size` последних ключей и вытесняет самый старый,
+    все операции O(1).
+    """
+
+    def __init__(self, max_size=1000):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._keys: OrderedDict[str, None] = OrderedDict()
+
+    @staticmethod
+    def key_for(line: str, cursor: str | None = None) -> str:
+        if cursor:
+            return cursor
+        return hashlib.blake2b(line.encode("utf8"), digest_size=16).hexdigest()
+
+    def seen(self, line: str, cursor: str | None = None) -> bool:
+        """True, если строка уже обрабатывалась; иначе запоминает её."""
+        key = self.key_for(line, cursor)
+        if key in self._keys:
+            self._keys.move_to_end(key)
+            self.hits += 1
+            return True
+
+        self.misses += 1
+        self._keys[key] = None
+        if len(self._keys) > self.max_size:
+            self._keys.popitem(last=False)
+        return False
+
+    def __len__(self) -> int:
+        return len(self._keys)
@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+
+
+IMMEDIATE = "immediate"
+BATCHED = "batched"
+DROP = "drop"
+
+# Лимит длины сообщения Telegram
+MAX_MESSAGE_LENGTH = 4096
+
+
+class DigestAggregator:
+    """
+    Сводки событий сервера для админ-чата.
+
+    События с политикой `immediate` отправляются сразу, `batched` копятся и уходят
+    одним сообщением раз в `window` секунд или при наборе `max_events` событий,
+    `drop` — не отправляются. Повторяющиеся строки в сводке склеиваются в «×N».
+
+    Пока `pending` истинно, часть событий есть только в памяти: читатель лога не
+    сохраняет курсор дальше строк, породивших эти события.
+    """
+
+    def __init__(self, send, policies: dict[str, str], window=30.0, max_events=30):
+        self.send = send
+        self.policies = policies
+        self.window = window
+        self.max_events = max_events
+
+        self._events: list[str] = []
+        self._first_event_at: float | None = None
+        self._flushing = 0
+        self._lock = asyncio.Lock()
+
+    @property
+    def pending(self) -> bool:
+        """Есть события, ещё не переданные в `send` (в том числе отправляемые прямо сейчас)."""
+        return bool(self._events) or self._flushing > 0
+
+    async def add(self, event_type: str, text: str):
+        policy = self.policies.get(event_type, IMMEDIATE)
+        if policy == DROP:
+            return
+        if policy != BATCHED:
+            await self.send(text)
+            return
+
+        async with self._lock:
+            if not self._events:
+                self._first_event_at = time.monotonic()
+            self._events.append(text)
+            full = len(self._events) >= self.max_events
+        if full:
+            await self.flush()
+
+    def _render(self, events: list[str], period: float) -> list[str]:
+        lines = []
+        for text, count in Counter(events).items():
+            lines.append(text if count == 1 else f"{text} ×{count}")
+
+        header = f"📋 Сводка за {period:.0f} с ({len(events)} событий):"
+        messages, current = [], header
+        for line in lines:
+            if len(current) + len(line) + 1 > MAX_MESSAGE_LENGTH:
+                messages.append(current)
+                current = line
+            else:
+                current += "\n" + line
+        messages.append(current)
+        return messages
+
+    async def flush(self):
+        async with self._lock:
+            events, self._events = self._events, []
+            first_event_at, self._first_event_at = self._first_event_at, None
+            if not events:
+                return
+            self._flushing += 1
+
+        try:
+            period = max(time.monotonic() - first_event_at, 1.0)
+            for message in self._render(events, period):
+                await self.send(message)
+        except Exception:
+            # Не потерять события: вернуть их в сводку до следующей попытки
+            async with self._lock:
+                self._events = events + self._events
+                self._first_event_at = first_event_at
+            raise
+        finally:
+            self._flushing -= 1
+
+    async def run(self):
+        try:
+            while True:
+                await asyncio.sleep(1.0)
+                if self._first_event_at is not None and time.monotonic() - self._first_event_at >= self.window:
+                    try:
+                        await self.flush()
+                    except Exception as e:
+                        logging.error(f"[digest] Не удалось отправить сводку: {e}")
+        except asyncio.CancelledError:
+            await self.flush()
+            logging.info("Digest task cancelled")
+            raise
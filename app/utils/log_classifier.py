@@ -0,0 +1,66 @@
+import re
+from dataclasses import dataclass
+
+import app.text as cs
+
+
+@dataclass(frozen=True)
+class LogEvent:
+    kind: str  # join / leave / rcon / chat / death
+    player: str | None = None
+    text: str | None = None  # сообщение чата, команда RCON или причина смерти
+
+
+def _death_alternation(patterns: list[str]) -> str:
+    # Дубликаты убираются, длинные шаблоны идут первыми, чтобы не перекрывались короткими
+    unique = sorted(dict.fromkeys(patterns), key=len, reverse=True)
+    return "|".join(f"(?:{pattern})" for pattern in unique)
+
+
+class LogClassifier:
+    """
+    Разбор строки лога сервера одним проходом скомпилированного регулярного выражения.
+
+    Все правила (вход, выход, RCON, чат, смерти) собраны в одну альтернацию с
+    именованными группами; побеждает самое левое совпадение, а при совпадении
+    в одной позиции — правило, стоящее раньше в выражении.
+    """
+
+    IGNORED = ("Saved the game",)
+
+    def __init__(self, death_patterns: list[str]):
+        # Правила сгруппированы по общему префиксу, чтобы на каждой позиции строки
+        # проверялся один-два символа, а не все правила подряд
+        self.pattern = re.compile(
+            r"\]: (?P<player>[^\s]+)(?:"
+            r" (?P<join>joined the game)"
+            r"| (?P<leave>left the game)"
+            r"|: (?P<chat>.+)"
+            rf"| (?P<death>{_death_alternation(death_patterns)})"
+            r")"
+            r"|\[Not Secure\] (?:"
+            r"\[Rcon\] (?P<rcon>.+)"
+            r"|<(?P<chat_alt_player>[^>]+)> (?P<chat_alt>.+)"
+            r")"
+        )
+
+    def classify(self, line: str) -> LogEvent | None:
+        for ignored in self.IGNORED:
+            if ignored in line:
+                return None
+
+        match = self.pattern.search(line)
+        if match is None:
+            return None
+
+        kind = match.lastgroup
+        if kind == "join" or kind == "leave":
+            return LogEvent(kind, player=match.group("player"))
+        if kind == "chat" or kind == "death":
+            return LogEvent(kind, player=match.group("player"), text=match.group(kind))
+        if kind == "chat_alt":
+            return LogEvent("chat", player=match.group("chat_alt_player"), text=match.group("chat_alt"))
+        return LogEvent("rcon", text=match.group("rcon"))
+
+
+classifier = LogClassifier(cs.death_patterns)
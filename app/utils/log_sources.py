@@ -0,0 +1,218 @@
+import asyncio
+import json
+import logging
+import os
+import shlex
+from contextlib import aclosing
+from datetime import datetime
+
+from app.utils.ssh_utils import SshSessionManager
+
+
+def journal_command(unit: str, cursor: str | None) -> str:
+    """journalctl в JSON: с сохранённого курсора или, если его нет, только новые записи."""
+    command = f"journalctl -u {shlex.quote(unit)} -f -o json"
+    if cursor:
+        return f"{command} --after-cursor={shlex.quote(cursor)}"
+    return f"{command} -n 0"
+
+
+def cursor_time(cursor: str | None) -> datetime | None:
+    """Время записи (UTC) из курсора journald: поле t= — realtime в микросекундах, в hex."""
+    for part in (cursor or "").split(";"):
+        if part.startswith("t="):
+            try:
+                return datetime.utcfromtimestamp(int(part[2:], 16) / 1_000_000)
+            except ValueError:
+                return None
+    return None
+
+
+def parse_journal_entry(raw: str) -> tuple[str, str | None] | None:
+    """
+    Запись journalctl -o json -> (строка в формате short, курсор).
+    Строка собирается как у journalctl по умолчанию, чтобы разбор лога не менялся.
+    """
+    try:
+        entry = json.loads(raw)
+    except json.JSONDecodeError:
+        entry = None
+    if not isinstance(entry, dict):
+        return (raw.strip(), None) if raw.strip() else None
+
+    message = entry.get("MESSAGE")
+    if message is None:
+        return None
+    if isinstance(message, list):
+        # journald отдаёт не-UTF8 сообщения массивом байт
+        message = bytes(message).decode("utf8", errors="replace")
+
+    timestamp = datetime.fromtimestamp(int(entry.get("__REALTIME_TIMESTAMP", 0)) / 1_000_000)
+    host = entry.get("_HOSTNAME", "")
+    ident = entry.get("SYSLOG_IDENTIFIER", "")
+    pid = entry.get("_PID")
+    prefix = f"{ident}[{pid}]" if pid else ident
+    line = f"{timestamp:%b %d %H:%M:%S} {host} {prefix}: {message.strip()}"
+    return line, entry.get("__CURSOR")
+
+
+class LogSource:
+    """
+    Источник строк лога сервера.
+
+    `run(queue, get_cursor)` бесконечно кладёт в очередь пачки записей
+    (строка, курсор) начиная с позиции `get_cursor()` и переподключается при
+    обрыве; при отмене задачи освобождает все ресурсы. Курсор сохраняется
+    в базе под ключом `cursor_key`.
+    """
+
+    cursor_key = "log_cursor"
+    reconnect_delay = 5
+
+    async def run(self, queue: asyncio.Queue, get_cursor):
+        while True:
+            try:
+                await self.stream(queue, get_cursor())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"{type(self).__name__}: {e}")
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def stream(self, queue: asyncio.Queue, cursor: str | None):
+        raise NotImplementedError
+
+
+class SshJournalSource(LogSource):
+    """journalctl на сервере по SSH, поверх общего с командами соединения."""
+
+    cursor_key = "journal_cursor"
+
+    def __init__(self, ssh: SshSessionManager, unit="minecraft"):
+        self.ssh = ssh
+        self.unit = unit
+
+    async def stream(self, queue: asyncio.Queue, cursor: str | None):
+        # При отмене задачи канал закрывается сразу, и journalctl -f на сервере завершается
+        async with aclosing(self.ssh.stream(journal_command(self.unit, cursor))) as batches:
+            async for raw_lines in batches:
+                batch = [entry for entry in map(parse_journal_entry, raw_lines) if entry]
+                if batch:
+                    await queue.put(batch)
+
+
+class JournaldSource(LogSource):
+    """Локальный journalctl, когда бот запущен на одном хосте с сервером."""
+
+    cursor_key = "journal_cursor"
+
+    def __init__(self, unit="minecraft", chunk_size=65536):
+        self.unit = unit
+        self.chunk_size = chunk_size
+
+    async def stream(self, queue: asyncio.Queue, cursor: str | None):
+        process = await asyncio.create_subprocess_exec(
+            *shlex.split(journal_command(self.unit, cursor)),
+            stdout=asyncio.subprocess.PIPE
+        )
+        try:
+            buffer = b""
+            while chunk := await process.stdout.read(self.chunk_size):
+                buffer += chunk
+                *lines, buffer = buffer.split(b"\n")
+                batch = [entry for entry in (parse_journal_entry(line.decode("utf8", errors="replace")) for line in lines) if entry]
+                if batch:
+                    await queue.put(batch)
+            logging.warning(f"journalctl завершился с кодом {await process.wait()}")
+        finally:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+
+
+class FileTailSource(LogSource):
+    """
+    Чтение logs/latest.log напрямую, без SSH.
+
+    Позиция — курсор вида «inode:смещение», поэтому после перезапуска бота чтение
+    продолжается с того же места. Ротация (сервер при старте архивирует старый
+    latest.log и создаёт новый) замечается по смене inode: старый файл дочитывается
+    до конца, новый читается с начала. Файл опрашивается раз в `poll_interval`
+    секунд — модулей inotify в стандартной библиотеке нет.
+    """
+
+    cursor_key = "file_cursor"
+
+    def __init__(self, path="logs/latest.log", poll_interval=0.5, chunk_size=262144):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.chunk_size = chunk_size
+
+    @staticmethod
+    def _parse_cursor(cursor: str | None) -> tuple[int | None, int]:
+        try:
+            inode, offset = cursor.split(":")
+            return int(inode), int(offset)
+        except (AttributeError, ValueError):
+            return None, 0
+
+    async def _drain(self, file, inode: int, offset: int, queue: asyncio.Queue) -> int:
+        """Дочитать файл до текущего конца; возвращает новое смещение (по целым строкам)."""
+        while True:
+            file.seek(offset)
+            data = file.read(self.chunk_size)
+            end = data.rfind(b"\n")
+            if end < 0:
+                return offset
+
+            batch = []
+            for line in data[:end].split(b"\n"):
+                offset += len(line) + 1
+                text = line.decode("utf8", errors="replace").strip()
+                if text:
+                    batch.append((text, f"{inode}:{offset}"))
+            if batch:
+                await queue.put(batch)
+
+    async def stream(self, queue: asyncio.Queue, cursor: str | None):
+        inode, offset = self._parse_cursor(cursor)
+        file = None
+        try:
+            while True:
+                try:
+                    stat = os.stat(self.path)
+                except FileNotFoundError:
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+
+                if file is None or stat.st_ino != inode or stat.st_size < offset:
+                    if file is not None:
+                        if stat.st_ino != inode:
+                            await self._drain(file, inode, offset, queue)
+                        file.close()
+                    first_open = file is None and inode is None
+                    file = open(self.path, "rb")
+                    if stat.st_ino != inode or stat.st_size < offset:
+                        # Новый файл читаем с начала; без сохранённой позиции — только новые строки
+                        offset = stat.st_size if first_open else 0
+                    inode = stat.st_ino
+
+                previous = offset
+                if stat.st_size > offset:
+                    offset = await self._drain(file, inode, offset, queue)
+                if offset == previous:
+                    # Нового нет или строка дописана не до конца
+                    await asyncio.sleep(self.poll_interval)
+        finally:
+            if file is not None:
+                file.close()
+
+
+def build_log_source(kind: str, config, ssh: SshSessionManager | None = None) -> LogSource:
+    if kind == "ssh":
+        return SshJournalSource(ssh, unit=config.journal_unit)
+    if kind == "journald":
+        return JournaldSource(unit=config.journal_unit)
+    if kind == "file":
+        return FileTailSource(path=config.log_file_path)
+    raise ValueError(f"Неизвестный источник логов: {kind}")
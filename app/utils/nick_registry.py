@@ -0,0 +1,46 @@
+class NickRegistry:
+    """
+    Двусторонняя карта ник Minecraft <-> Telegram ID в памяти.
+
+    Ники сравниваются без учёта регистра, как и в уникальном индексе
+    users.mc_name. Карта загружается из базы один раз при старте и дальше
+    обновляется теми же функциями, что пишут ник в базу, поэтому обработка
+    смертей из лога обходится без запросов к базе.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self._by_nick: dict[str, int] = {}
+        self._by_tg_id: dict[int, str] = {}
+
+    @staticmethod
+    def _key(mc_name: str) -> str:
+        return mc_name.strip().lower()
+
+    def load(self, pairs):
+        """Заполнить карту парами (tg_id, mc_name) из базы."""
+        self._by_nick.clear()
+        self._by_tg_id.clear()
+        for tg_id, mc_name in pairs:
+            if mc_name:
+                self.set(tg_id, mc_name)
+        self.loaded = True
+
+    def get_tg_id(self, mc_name: str) -> int | None:
+        return self._by_nick.get(self._key(mc_name))
+
+    def get_mc_name(self, tg_id: int) -> str | None:
+        return self._by_tg_id.get(tg_id)
+
+    def set(self, tg_id: int, mc_name: str):
+        self.discard(tg_id)
+        self._by_nick[self._key(mc_name)] = tg_id
+        self._by_tg_id[tg_id] = mc_name
+
+    def discard(self, tg_id: int):
+        old = self._by_tg_id.pop(tg_id, None)
+        if old is not None and self._by_nick.get(self._key(old)) == tg_id:
+            del self._by_nick[self._key(old)]
+
+    def __len__(self) -> int:
+        return len(self._by_tg_id)
@@ -0,0 +1,164 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from aiogram import Bot
+from sqlalchemy import delete, func, select, update
+
+from app.database.models import OutboxMessage
+from app.utils.broadcast import BroadcastResult, Broadcaster
+from app.utils.metrics import metrics
+
+
+OUTBOX_DELIVERY_SECONDS = metrics.histogram(
+    "outbox_delivery_seconds",
+    "От события (для сообщений из лога — от записи в журнале) до отправки в Telegram",
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+)
+OUTBOX_DEPTH = metrics.gauge("outbox_depth", "Сообщений в очереди outbox на момент последнего отчёта")
+
+
+class Outbox:
+    """
+    Очередь исходящих сообщений в SQLite.
+
+    `enqueue` только записывает сообщение в таблицу и сразу возвращается, доставкой
+    занимаются фоновые воркеры `run()`. Сообщения переживают перезапуск бота,
+    недоставленные повторяются с экспоненциальной задержкой, сообщения в один
+    чат уходят строго по порядку.
+    """
+
+    def __init__(self, session_factory, sender: Broadcaster, workers=4, batch_size=50,
+                 poll_interval=5.0, max_attempts=10, report_interval=60.0):
+        self.session_factory = session_factory
+        self.sender = sender
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.report_interval = report_interval
+
+        self.delivered = 0
+        self.dropped = 0
+        self.latency_avg = 0.0
+        self.latency_max = 0.0
+
+        self._wakeup = asyncio.Event()
+
+    async def enqueue(self, chat_id: int, text: str, parse_mode: str | None = None, created_at: datetime | None = None):
+        """`created_at` — время исходного события (UTC), если оно раньше постановки в очередь."""
+        now = datetime.utcnow()
+        async with self.session_factory() as session:
+            session.add(OutboxMessage(
+                chat_id=chat_id,
+                text=text,
+                parse_mode=parse_mode,
+                attempts=0,
+                created_at=created_at or now,
+                next_attempt_at=now
+            ))
+            await session.commit()
+        self._wakeup.set()
+
+    async def depth(self) -> int:
+        async with self.session_factory() as session:
+            return await session.scalar(select(func.count()).select_from(OutboxMessage))
+
+    async def _fetch_due(self) -> list[OutboxMessage]:
+        async with self.session_factory() as session:
+            result = await session.execute(
+                select(OutboxMessage)
+                .where(OutboxMessage.next_attempt_at <= datetime.utcnow())
+                .order_by(OutboxMessage.id)
+                .limit(self.batch_size)
+            )
+            return list(result.scalars().all())
+
+    async def _deliver_chat(self, bot: Bot, messages: list[OutboxMessage], semaphore: asyncio.Semaphore):
+        async with semaphore:
+            for message in messages:
+                result = BroadcastResult(total=1)
+                await self.sender.send(bot, message.chat_id, message.text, result=result, parse_mode=message.parse_mode)
+
+                if result.sent or result.blocked or message.attempts + 1 >= self.max_attempts:
+                    await self._remove(message)
+                    if result.sent:
+                        self._record_latency(message)
+                    else:
+                        self.dropped += 1
+                        logging.warning(f"[outbox] Сообщение {message.id} в чат {message.chat_id} не доставлено и удалено")
+                    continue
+
+                # Не доставлено: остальные сообщения в этот чат ждут, чтобы не нарушить порядок
+                await self._reschedule(message)
+                break
+
+    async def _remove(self, message: OutboxMessage):
+        async with self.session_factory() as session:
+            await session.execute(delete(OutboxMessage).where(OutboxMessage.id == message.id))
+            await session.commit()
+
+    async def _reschedule(self, message: OutboxMessage):
+        next_attempt_at = datetime.utcnow() + timedelta(seconds=min(2 ** message.attempts, 300))
+        async with self.session_factory() as session:
+            await session.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.id == message.id)
+                .values(attempts=message.attempts + 1)
+            )
+            # Более поздние сообщения в этот чат откладываются вместе с ним
+            await session.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.chat_id == message.chat_id, OutboxMessage.id >= message.id)
+                .values(next_attempt_at=next_attempt_at)
+            )
+            await session.commit()
+
+    def _record_latency(self, message: OutboxMessage):
+        latency = (datetime.utcnow() - message.created_at).total_seconds()
+        self.delivered += 1
+        self.latency_avg += (latency - self.latency_avg) / min(self.delivered, 100)
+        self.latency_max = max(self.latency_max, latency)
+        OUTBOX_DELIVERY_SECONDS.observe(latency)
+
+    async def _report(self):
+        depth = await self.depth()
+        OUTBOX_DEPTH.set(depth)
+        logging.info(
+            f"[outbox] В очереди {depth}, доставлено {self.delivered}, удалено {self.dropped}, "
+            f"задержка доставки ср. {self.latency_avg:.2f} с, макс. {self.latency_max:.2f} с"
+        )
+
+    async def run(self, bot: Bot):
+        semaphore = asyncio.Semaphore(self.workers)
+        last_report = time.monotonic()
+        try:
+            while True:
+                self._wakeup.clear()
+                try:
+                    messages = await self._fetch_due()
+                    by_chat: dict[int, list[OutboxMessage]] = defaultdict(list)
+                    for message in messages:
+                        by_chat[message.chat_id].append(message)
+                    await asyncio.gather(*(
+                        self._deliver_chat(bot, chat_messages, semaphore) for chat_messages in by_chat.values()
+                    ))
+                except Exception as e:
+                    logging.error(f"[outbox] Ошибка доставки: {e}")
+                    messages = []
+
+                if time.monotonic() - last_report >= self.report_interval:
+                    last_report = time.monotonic()
+                    await self._report()
+
+                # Полная пачка — сразу за следующей, иначе ждём новых сообщений
+                if len(messages) < self.batch_size:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+        except asyncio.CancelledError:
+            logging.info("Outbox worker cancelled")
+            raise
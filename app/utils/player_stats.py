@@ -0,0 +1,71 @@
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+import app.text as cs
+
+
+NO_DATA = "Пока нет данных"
+UNKNOWN_FORMAT = "Неизвестный формат ответа"
+
+SCORE_RE = re.compile(r"has (-?\d+)")
+TRACKED_RE = re.compile(r"tracked entit(?:y|ies): (.+)$", re.S)
+PLAYER_NAME_RE = re.compile(r"^[A-Za-z0-9_]{3,16}$")
+
+
+def stats_now() -> datetime:
+    """Время для отметок статистики: как и в базе, московское без часового пояса."""
+    return datetime.utcnow() + timedelta(hours=3)
+
+
+def scoreboard_get_command(mc_name: str, objective: str) -> str:
+    return f"scoreboard players get {mc_name} {objective}"
+
+
+def parse_tracked_players(output: str) -> list[str]:
+    """Ники игроков из ответа `scoreboard players list` (UUID сущностей отбрасываются)."""
+    match = TRACKED_RE.search(output)
+    if not match:
+        return []
+    names = (name.strip() for name in match.group(1).split(","))
+    return [name for name in names if PLAYER_NAME_RE.match(name)]
+
+
+def parse_scoreboard_value(output: str) -> int | str:
+    """Разобрать ответ `scoreboard players get` в число или текст-заглушку."""
+    if "Can't get value" in output or "none is set" in output:
+        return NO_DATA
+
+    match = SCORE_RE.search(output)
+    if match:
+        return int(match.group(1))
+    return UNKNOWN_FORMAT
+
+
+def format_value(objective: str, val: int | str) -> str:
+    if objective == "walk_km" and isinstance(val, int):
+        return f"{val / 1000:.2f}"
+    return str(val)
+
+
+@dataclass
+class PlayerStats:
+    """Значения всех целей табло для одного игрока."""
+
+    mc_name: str
+    values: dict[str, int | str] = field(default_factory=dict)
+    # Время снятия значений с сервера (живой опрос или сохранённый снимок)
+    updated_at: datetime | None = None
+
+    def get(self, objective: str) -> int | str:
+        return self.values.get(objective, NO_DATA)
+
+    def render_lines(self) -> list[str]:
+        lines = []
+        for obj in cs.OBJECTIVES:
+            ru_name = cs.OBJECTIVES_RU.get(obj.lower(), obj)
+            lines.append(f"• {ru_name}: {format_value(obj, self.get(obj))}")
+        return lines
+
+    def render(self) -> str:
+        return "\n".join(self.render_lines())
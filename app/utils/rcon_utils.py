@@ -1,23 +1,322 @@
-from mcrcon import MCRcon
 import asyncio
+import itertools
+import logging
+import struct
+import time
+
+from app.utils.metrics import metrics
+
+
+# Типы пакетов Source RCON
+SERVERDATA_AUTH = 3
+SERVERDATA_AUTH_RESPONSE = 2
+SERVERDATA_EXECCOMMAND = 2
+SERVERDATA_RESPONSE_VALUE = 0
+
+# Сервер режет длинные ответы на фрагменты по 4096 байт с одинаковым id
+MAX_FRAGMENT_SIZE = 4096
+
+RCON_SECONDS = metrics.histogram("rcon_command_seconds", "Время выполнения команды RCON через пул, с повторами", ["command"])
+RCON_ERRORS = metrics.counter("rcon_errors_total", "Неудачные попытки команд RCON", ["command", "error"])
+
+
+def command_label(command: str) -> str:
+    """Метка метрики — только имя команды, без аргументов (ников, координат)."""
+    words = command.lstrip("/").split(maxsplit=1)
+    return words[0] if words else ""
+
+
+class RconError(Exception):
+    pass
+
+
+class RconAuthError(RconError):
+    pass
+
+
+def encode_packet(request_id: int, packet_type: int, body: str) -> bytes:
+    payload = struct.pack("<ii", request_id, packet_type) + body.encode("utf8") + b"\x00\x00"
+    return struct.pack("<i", len(payload)) + payload
+
 
 class RconClient:
-    def __init__(self, host, port, password):
+    """
+    Асинхронный клиент протокола Source RCON поверх asyncio streams.
+
+    Один фоновый читатель разбирает входящие пакеты и раздаёт их ожидающим
+    командам по id пакета, поэтому по одному соединению может идти несколько
+    команд одновременно. Ванильный сервер читает из сокета только один пакет
+    за раз (MC-72390), поэтому по умолчанию следующая команда уходит только
+    после начала ответа на предыдущую (max_in_flight=1).
+    """
+
+    def __init__(self, host, port, password, timeout=5.0, max_in_flight=1, fragment_wait=0.05):
         self.host = host
         self.port = port
         self.password = password
-        self.mcr = None
+        self.timeout = timeout
+        self.fragment_wait = fragment_wait
+        self.last_used = 0.0
+
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._read_task: asyncio.Task | None = None
+        self._ids = itertools.count(1)
+        self._pending: dict[int, tuple[asyncio.Future, list[bytes]]] = {}
+        self._window = asyncio.Semaphore(max_in_flight)
+        self._write_lock = asyncio.Lock()
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing() \
+            and self._read_task is not None and not self._read_task.done()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    async def connect(self):
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), timeout=self.timeout
+        )
+        try:
+            await asyncio.wait_for(self._authenticate(), timeout=self.timeout)
+        except BaseException:
+            self.disconnect()
+            raise
+        self._read_task = asyncio.create_task(self._read_loop())
+        self.last_used = time.monotonic()
+
+    async def _read_packet(self) -> tuple[int, int, bytes]:
+        (length,) = struct.unpack("<i", await self._reader.readexactly(4))
+        if length < 10:
+            raise RconError(f"Некорректная длина пакета: {length}")
+        payload = await self._reader.readexactly(length)
+        request_id, packet_type = struct.unpack("<ii", payload[:8])
+        return request_id, packet_type, payload[8:-2]
+
+    async def _authenticate(self):
+        request_id = next(self._ids)
+        self._writer.write(encode_packet(request_id, SERVERDATA_AUTH, self.password))
+        await self._writer.drain()
+
+        while True:
+            response_id, packet_type, _ = await self._read_packet()
+            # Некоторые реализации сначала шлют пустой RESPONSE_VALUE
+            if packet_type != SERVERDATA_AUTH_RESPONSE:
+                continue
+            if response_id == -1:
+                raise RconAuthError("Неверный пароль RCON")
+            if response_id == request_id:
+                return
+
+    async def _read_loop(self):
+        error: BaseException = ConnectionResetError("RCON соединение закрыто")
+        try:
+            while True:
+                request_id, _, body = await self._read_packet()
+                pending = self._pending.get(request_id)
+                if pending is None:
+                    continue
+                future, fragments = pending
+                if not fragments:
+                    # Сервер начал отвечать — можно отправлять следующую команду
+                    self._window.release()
+                fragments.append(body)
+                if len(body) < MAX_FRAGMENT_SIZE:
+                    self._finish(request_id)
+                else:
+                    # Фрагмент максимального размера: ждём продолжения, иначе ответ закончен
+                    asyncio.get_running_loop().call_later(
+                        self.fragment_wait, self._finish_if_idle, request_id, len(fragments)
+                    )
+        except asyncio.IncompleteReadError:
+            pass
+        except (OSError, RconError) as e:
+            error = e
+        finally:
+            self._fail_pending(error)
 
-    def connect(self):
-        self.mcr = MCRcon(self.host, self.password, port=self.port)
-        self.mcr.connect()
+    def _finish(self, request_id: int):
+        future, fragments = self._pending.pop(request_id)
+        if not future.done():
+            future.set_result(b"".join(fragments).decode("utf8", errors="replace"))
+
+    def _finish_if_idle(self, request_id: int, fragment_count: int):
+        pending = self._pending.get(request_id)
+        if pending is not None and len(pending[1]) == fragment_count:
+            self._finish(request_id)
+
+    def _fail_pending(self, error: BaseException):
+        for request_id, (future, fragments) in list(self._pending.items()):
+            if not fragments:
+                self._window.release()
+            if not future.done():
+                future.set_exception(error)
+        self._pending.clear()
+
+    async def run_command(self, command: str, timeout=None) -> str:
+        if not self.connected:
+            raise ConnectionResetError("RCON не подключён")
+
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+
+        await self._window.acquire()
+        self._pending[request_id] = (future, [])
+        try:
+            async with self._write_lock:
+                self._writer.write(encode_packet(request_id, SERVERDATA_EXECCOMMAND, command))
+                await self._writer.drain()
+            result = await asyncio.wait_for(future, timeout=timeout or self.timeout)
+            self.last_used = time.monotonic()
+            return result
+        except BaseException:
+            pending = self._pending.pop(request_id, None)
+            if pending is not None and not pending[1]:
+                self._window.release()
+            raise
 
     def disconnect(self):
-        if self.mcr:
-            self.mcr.disconnect()
+        if self._read_task:
+            self._read_task.cancel()
+            self._read_task = None
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+        self._reader = None
+        self._fail_pending(ConnectionResetError("RCON соединение закрыто"))
+
+
+class RconPool:
+    """
+    Пул долгоживущих RCON-подключений.
+
+    Держит до `size` авторизованных соединений, распределяет команды по ним,
+    переподключается при обрыве с экспоненциальной задержкой и периодически
+    проверяет простаивающие соединения.
+    """
+
+    RETRY_ERRORS = (ConnectionError, OSError, EOFError, asyncio.TimeoutError, asyncio.IncompleteReadError)
+
+    def __init__(self, host, port, password, size=2, max_in_flight=1,
+                 command_timeout=10.0, health_interval=60.0, max_backoff=30.0, resolve=None):
+        self.host = host
+        # resolve(host) -> ip: общий кэш DNS, чтобы переподключение не резолвило имя заново
+        self.resolve = resolve
+        self.port = port
+        self.password = password
+        self.size = size
+        self.max_in_flight = max_in_flight
+        self.command_timeout = command_timeout
+        self.health_interval = health_interval
+        self.max_backoff = max_backoff
+
+        self._clients: list[RconClient | None] = [None] * size
+        self._connect_locks = [asyncio.Lock() for _ in range(size)]
+        self._semaphore = asyncio.Semaphore(size * max_in_flight)
+        self._health_task: asyncio.Task | None = None
+        self._closed = False
+
+    def _pick_slot(self) -> int:
+        # Наименее загруженное живое соединение, иначе первый пустой слот
+        def load(i):
+            client = self._clients[i]
+            if client is None or not client.connected:
+                return (1, 0)
+            return (0, client.in_flight)
+        return min(range(self.size), key=load)
+
+    async def _acquire(self) -> RconClient:
+        slot = self._pick_slot()
+        async with self._connect_locks[slot]:
+            client = self._clients[slot]
+            if client is None or not client.connected:
+                if client is not None:
+                    client.disconnect()
+                host = await self.resolve(self.host) if self.resolve else self.host
+                client = RconClient(
+                    host, self.port, self.password,
+                    timeout=self.command_timeout, max_in_flight=self.max_in_flight
+                )
+                await client.connect()
+                self._clients[slot] = client
+                logging.info(f"RCON: открыто новое соединение с {self.host}:{self.port}")
+            return client
+
+    async def run_command(self, command: str, retries=3, delay=2) -> str:
+        """Выполнить команду через пул с повторными попытками при обрыве соединения."""
+        return await self._with_retries(lambda client: client.run_command(command), retries, delay, command_label(command))
+
+    async def run_batch(self, commands: list[str], retries=3, delay=2) -> list[str]:
+        """
+        Выполнить пачку команд по одному соединению.
+
+        Все команды отправляются сразу и сопоставляются с ответами по id пакета,
+        результаты возвращаются в порядке `commands`.
+        """
+        async def batch(client: RconClient) -> list[str]:
+            return list(await asyncio.gather(*(client.run_command(command) for command in commands)))
+
+        label = f"batch:{command_label(commands[0])}" if commands else "batch"
+        return await self._with_retries(batch, retries, delay, label)
+
+    async def _with_retries(self, operation, retries, delay, label):
+        self._ensure_health_task()
+        started = time.perf_counter()
+
+        for attempt in range(retries):
+            client = None
+            try:
+                async with self._semaphore:
+                    client = await self._acquire()
+                    result = await operation(client)
+                RCON_SECONDS.observe(time.perf_counter() - started, command=label)
+                return result
+            except RconAuthError as e:
+                RCON_ERRORS.inc(command=label, error=type(e).__name__)
+                raise
+            except self.RETRY_ERRORS as e:
+                RCON_ERRORS.inc(command=label, error=type(e).__name__)
+                if client:
+                    client.disconnect()
+                logging.warning(f"RCON attempt {attempt + 1} failed: {e}")
+                if attempt == retries - 1:
+                    raise
+                await asyncio.sleep(min(delay * 2 ** attempt, self.max_backoff))
+            except Exception as e:
+                RCON_ERRORS.inc(command=label, error=type(e).__name__)
+                logging.error(f"Unexpected RCON error: {e}")
+                raise
+
+    def _ensure_health_task(self):
+        if self._closed:
+            raise RconError("RCON пул закрыт")
+        if self._health_task is None or self._health_task.done():
+            self._health_task = asyncio.create_task(self._health_loop())
 
-    def run_command(self, command):
-        return self.mcr.command(command)
+    async def _health_loop(self):
+        """Проверка простаивающих соединений, мёртвые закрываются и переоткрываются по требованию."""
+        try:
+            while not self._closed:
+                await asyncio.sleep(self.health_interval)
+                now = time.monotonic()
+                for client in list(self._clients):
+                    if client is None or client.in_flight or now - client.last_used < self.health_interval:
+                        continue
+                    try:
+                        await client.run_command("list")
+                    except Exception as e:
+                        logging.warning(f"RCON: соединение не прошло проверку и закрыто: {e}")
+                        client.disconnect()
+        except asyncio.CancelledError:
+            pass
 
-    async def run_command_async(self, command):
-        return await asyncio.to_thread(self.run_command, command)
\ No newline at end of file
+    async def close(self):
+        self._closed = True
+        if self._health_task:
+            self._health_task.cancel()
+        for client in self._clients:
+            if client:
+                client.disconnect()
+        self._clients = [None] * self.size
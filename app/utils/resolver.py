@@ -0,0 +1,144 @@
+import asyncio
+import ipaddress
+import logging
+import socket
+import time
+from dataclasses import dataclass
+
+import dns.asyncresolver
+import dns.exception
+import dns.resolver
+
+
+class ResolveError(Exception):
+    pass
+
+
+@dataclass
+class _Entry:
+    value: tuple[str, int] | None
+    expires_at: float
+    refresh_at: float
+    error: str | None = None
+
+
+class ResolverCache:
+    """
+    Кэш DNS/SRV-резолва адреса сервера.
+
+    * положительные ответы живут столько, сколько разрешает TTL записи
+      (в пределах `min_ttl`..`max_ttl`);
+    * ошибки резолва кэшируются на `negative_ttl`, чтобы не долбить резолвер;
+    * после `refresh_ahead` доли TTL запись обновляется в фоне, запросы её не ждут;
+    * если резолвер временно не отвечает, отдаётся последний известный адрес —
+      сбой DNS не выглядит как падение сервера.
+    """
+
+    def __init__(self, default_ttl=300.0, negative_ttl=30.0, min_ttl=5.0, max_ttl=3600.0,
+                 refresh_ahead=0.8, timeout=3.0):
+        self.default_ttl = default_ttl
+        self.negative_ttl = negative_ttl
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.refresh_ahead = refresh_ahead
+        self.timeout = timeout
+
+        # Ключ: (хост, порт, искать ли SRV)
+        self._entries: dict[tuple[str, int, bool], _Entry] = {}
+        self._inflight: dict[tuple[str, int, bool], asyncio.Task] = {}
+
+    async def resolve_host(self, host: str) -> str:
+        """IP-адрес хоста (A-запись)."""
+        ip, _ = await self._resolve(host, 0, srv=False)
+        return ip
+
+    async def resolve_minecraft(self, host: str, port: int | None = None) -> tuple[str, int]:
+        """
+        Адрес Minecraft сервера. Без явного порта сначала ищется SRV-запись
+        `_minecraft._tcp.<host>`, как это делает клиент игры.
+        """
+        return await self._resolve(host, port or 25565, srv=port is None)
+
+    async def _resolve(self, host: str, port: int, srv: bool) -> tuple[str, int]:
+        if _is_ip(host):
+            return host, port
+
+        key = (host, port, srv)
+        entry = self._entries.get(key)
+        now = time.monotonic()
+
+        if entry is not None and now < entry.expires_at:
+            if entry.value is None:
+                raise ResolveError(entry.error)
+            if now >= entry.refresh_at:
+                self._refresh(key)
+            return entry.value
+
+        return await asyncio.shield(self._refresh(key))
+
+    def _refresh(self, key) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._lookup(key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._lookup_done(key, t))
+        return task
+
+    def _lookup_done(self, key, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        # Ошибку фонового обновления забираем здесь, ожидающие получат её сами
+        if not task.cancelled():
+            task.exception()
+
+    async def _lookup(self, key) -> tuple[str, int]:
+        host, port, srv = key
+        now = time.monotonic()
+        try:
+            value, ttl = await asyncio.wait_for(self._query(host, port, srv), timeout=self.timeout)
+        except Exception as e:
+            stale = self._entries.get(key)
+            if stale is not None and stale.value is not None:
+                # Резолвер лежит — продолжаем ходить по старому адресу
+                logging.warning(f"DNS: не удалось обновить {host}, используем {stale.value[0]}: {e}")
+                stale.expires_at = now + self.negative_ttl
+                stale.refresh_at = stale.expires_at
+                return stale.value
+            self._entries[key] = _Entry(None, now + self.negative_ttl, now + self.negative_ttl, error=str(e) or type(e).__name__)
+            raise ResolveError(f"Не удалось разрешить {host}: {e}") from e
+
+        ttl = min(max(ttl, self.min_ttl), self.max_ttl)
+        self._entries[key] = _Entry(value, now + ttl, now + ttl * self.refresh_ahead)
+        return value
+
+    async def _query(self, host: str, port: int, srv: bool) -> tuple[tuple[str, int], float]:
+        ttls = []
+        if srv:
+            try:
+                answer = await dns.asyncresolver.resolve(f"_minecraft._tcp.{host}", "SRV")
+                record = answer[0]
+                host, port = str(record.target).rstrip("."), record.port
+                ttls.append(answer.rrset.ttl)
+            except dns.exception.DNSException:
+                pass
+
+        if _is_ip(host):
+            return (host, port), min(ttls, default=self.default_ttl)
+
+        try:
+            answer = await dns.asyncresolver.resolve(host, "A")
+            ttls.append(answer.rrset.ttl)
+            return (answer[0].address, port), min(ttls)
+        except dns.exception.DNSException:
+            # Имена из /etc/hosts и прочие локальные — через системный резолвер
+            infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+            if not infos:
+                raise
+            return (infos[0][4][0], port), min(ttls, default=self.default_ttl)
+
+
+def _is_ip(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
@@ -0,0 +1,159 @@
+import asyncio
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+
+
+COLOR_CODE_RE = re.compile(r"§[0-9a-fk-or]", re.I)
+
+# 1.13+: "There are 2 of a max of 20 players online: Steve, Alex"; старые версии: "There are 2/20 players online:"
+LIST_RE = re.compile(r"There are (\d+)(?: of a max of |/)(\d+) players online:?(.*)", re.S)
+
+# Paper/Spigot: "TPS from last 1m, 5m, 15m: 20.0, 19.98, *20.0"
+PAPER_TPS_RE = re.compile(r"TPS from last [^:]+:\s*(.+)")
+TPS_VALUE_RE = re.compile(r"\*?(\d+(?:\.\d+)?)")
+
+# Forge: "Dim minecraft:overworld (minecraft:overworld): Mean tick time: 1.234 ms. Mean TPS: 20.000"
+#        "Overall: Mean tick time: 1.234 ms. Mean TPS: 20.000"
+# По RCON строки ответа часто приходят склеенными, поэтому выражения не привязаны к началу строки
+FORGE_TPS_RE = re.compile(
+    r"(?:Dim\s+(?P<name>.+?)|Overall)\s*:\s*Mean tick time:\s*(?P<mspt>[\d.]+) ms\.?\s*Mean TPS:\s*(?P<tps>[\d.]+)"
+)
+# NeoForge: "minecraft:overworld: 20.000 TPS (1.234 ms/tick)"
+NEOFORGE_TPS_RE = re.compile(r"(?P<name>\S.*?)\s*:\s*(?P<tps>[\d.]+) TPS \((?P<mspt>[\d.]+) ms/tick\)")
+# "minecraft:overworld (minecraft:overworld)" -> "minecraft:overworld"
+REPEATED_NAME_RE = re.compile(r"^(\S+) \(\1\)$")
+
+
+@dataclass
+class DimensionTps:
+    name: str
+    tps: float
+    mspt: float | None = None
+
+
+@dataclass
+class ServerStats:
+    online: int | None = None
+    max_players: int | None = None
+    players: list[str] = field(default_factory=list)
+    # Paper: средний TPS за 1, 5 и 15 минут
+    tps: list[float] = field(default_factory=list)
+    # Forge/NeoForge: TPS и время тика по измерениям, "Overall" — по серверу в целом
+    dimensions: list[DimensionTps] = field(default_factory=list)
+    fetched_at: datetime = field(default_factory=datetime.now)
+
+    def render(self) -> str:
+        lines = ["📊 Статистика сервера:", ""]
+
+        if self.online is None:
+            lines.append("👥 Онлайн: нет данных")
+        else:
+            lines.append(f"👥 Онлайн: {self.online}/{self.max_players}")
+            if self.players:
+                lines.append(", ".join(self.players))
+        lines.append("")
+
+        if self.tps:
+            periods = ["1м", "5м", "15м"]
+            values = ", ".join(f"{period}: {value:.1f}" for period, value in zip(periods, self.tps))
+            lines.append(f"⚙️ TPS ({values})")
+        elif self.dimensions:
+            lines.append("⚙️ TPS:")
+            for dim in self.dimensions:
+                mspt = f", {dim.mspt:.1f} мс/тик" if dim.mspt is not None else ""
+                lines.append(f"• {dim.name}: {dim.tps:.1f}{mspt}")
+        else:
+            lines.append("⚙️ TPS недоступен.")
+
+        lines.append("")
+        lines.append(f"Обновлено: {self.fetched_at:%H:%M:%S}")
+        return "\n".join(lines)
+
+
+def strip_colors(text: str) -> str:
+    return COLOR_CODE_RE.sub("", text)
+
+
+def parse_list(output: str) -> tuple[int, int, list[str]] | None:
+    """Ответ `list` -> (онлайн, максимум, ники); None, если формат не распознан."""
+    match = LIST_RE.search(strip_colors(output))
+    if not match:
+        return None
+    names = [name.strip() for name in match.group(3).split(",") if name.strip()]
+    return int(match.group(1)), int(match.group(2)), names
+
+
+def parse_tps(output: str) -> tuple[list[float], list[DimensionTps]]:
+    """Ответ `tps` -> (TPS Paper за 1/5/15 минут, TPS Forge по измерениям). Пустые списки — команды нет."""
+    text = strip_colors(output)
+
+    match = PAPER_TPS_RE.search(text)
+    if match:
+        return [float(value) for value in TPS_VALUE_RE.findall(match.group(1))], []
+
+    found = list(FORGE_TPS_RE.finditer(text)) or list(NEOFORGE_TPS_RE.finditer(text))
+    dimensions = [
+        DimensionTps(
+            name=REPEATED_NAME_RE.sub(r"\1", (match.group("name") or "Overall").strip()),
+            tps=float(match.group("tps")),
+            mspt=float(match.group("mspt"))
+        )
+        for match in found
+    ]
+    return [], dimensions
+
+
+class ServerStatsService:
+    """
+    Снимок `list` + `tps` с коротким TTL, общий для всех, кто сейчас смотрит статистику.
+
+    Пока снимок свежий, RCON не трогается; если он устарел, все одновременные
+    запросы ждут один и тот же опрос сервера.
+    """
+
+    def __init__(self, run_command, ttl=5.0):
+        self.run_command = run_command
+        self.ttl = ttl
+        self._snapshot: ServerStats | None = None
+        self._fetched_at = 0.0
+        self._inflight: asyncio.Task | None = None
+
+    async def _fetch(self) -> ServerStats:
+        list_resp, tps_resp = await asyncio.gather(
+            self.run_command("list"),
+            self.run_command("tps"),
+            return_exceptions=True
+        )
+        if isinstance(list_resp, BaseException):
+            raise list_resp
+
+        stats = ServerStats()
+        parsed = parse_list(list_resp)
+        if parsed:
+            stats.online, stats.max_players, stats.players = parsed
+        if not isinstance(tps_resp, BaseException):
+            stats.tps, stats.dimensions = parse_tps(tps_resp)
+
+        self._snapshot = stats
+        self._fetched_at = time.monotonic()
+        return stats
+
+    async def get(self) -> ServerStats:
+        if self._snapshot is not None and time.monotonic() - self._fetched_at < self.ttl:
+            return self._snapshot
+
+        if self._inflight is None:
+            self._inflight = asyncio.create_task(self._fetch())
+            self._inflight.add_done_callback(self._clear_inflight)
+        return await asyncio.shield(self._inflight)
+
+    def _clear_inflight(self, task: asyncio.Task):
+        self._inflight = None
+        if not task.cancelled():
+            # Ошибку получат ожидающие; здесь лишь помечаем её полученной
+            task.exception()
+
+    def invalidate(self):
+        self._snapshot = None
@@ -2,11 +2,17 @@ import asyncio
 import logging
 
 from config import config
-from app.database.requests import is_server_running, run_rcon_command, ssh_log_reader, process_log_line
+from app.database.requests import is_server_running, run_rcon_command, process_log_line, stats_cache, status_monitor, log_source
+from app.database.requests import admin_digest, get_bot_state, set_bot_state
+from app.utils.metrics import metrics
 
 
 logging.basicConfig(level=logging.INFO)
 
+LOG_QUEUE_DEPTH = metrics.gauge("log_queue_depth", "Пачек строк лога, ожидающих обработки")
+LOG_LINES = metrics.counter("log_lines_total", "Прочитанных строк лога")
+LOG_BATCH_SECONDS = metrics.histogram("log_batch_seconds", "Обработка одной пачки строк лога")
+
 
 class ServerTasks:
     def __init__(self, bot):
@@ -14,11 +20,14 @@ class ServerTasks:
         self.tasks = {}
         self.server_was_up = False
         self.config = config
+        self.log_cursor = None
+        # Курсор перед первой строкой, чьё событие ещё лежит в несброшенной сводке
+        self.digest_hold: tuple[str | None] | None = None
 
 
     async def manage_tasks(self):
-        while True:
-            is_up = await is_server_running()
+        async for state in status_monitor.updates():
+            is_up = state.online
 
             if is_up and not self.server_was_up:
                 await self.start_tasks()
@@ -29,8 +38,6 @@ class ServerTasks:
                 self.server_was_up = False
                 logging.info("Сервер остановлен, задачи остановлены.")
 
-            await asyncio.sleep(10)
-
     
     async def start_tasks(self):
         """Запуск всех задач, связанных с сервером"""
@@ -38,14 +45,10 @@ class ServerTasks:
             self.tasks['save_task'] = asyncio.create_task(self.safe_periodic_save_task())
         
         if 'log_watcher' not in self.tasks:
-            self.tasks['log_watcher'] = asyncio.create_task(
-                self.safe_log_watcher_task(
-                    host=self.config.mc_host.get_secret_value(),
-                    port=self.config.ssh_port,
-                    user=self.config.ssh_user.get_secret_value(),
-                    password=self.config.ssh_pass.get_secret_value()
-                )
-            )
+            self.tasks['log_watcher'] = asyncio.create_task(self.safe_log_watcher_task(log_source))
+
+        if 'stats_refresh' not in self.tasks:
+            self.tasks['stats_refresh'] = asyncio.create_task(stats_cache.refresh_loop())
 
     
     async def stop_tasks(self):
@@ -65,7 +68,7 @@ class ServerTasks:
             while True:
                 if await is_server_running():
                     try:
-                        result = run_rcon_command("save-all")
+                        result = await run_rcon_command("save-all")
                         logging.info(f"[save-all] Команда выполнена: {result}")
                     except Exception as e:
                         logging.error(f"[save-all] Ошибка: {e}")
@@ -75,31 +78,66 @@ class ServerTasks:
             raise
 
 
-    async def safe_log_watcher_task(self, host, port, user, password):
+    def durable_cursor(self) -> str | None:
+        """
+        Курсор, который можно сохранить в базу: не дальше строк, события которых
+        есть только в памяти сводки. После падения бота эти строки прочитаются
+        снова, и события не потеряются (ценой возможных повторов).
+        """
+        if not admin_digest.pending:
+            self.digest_hold = None
+        if self.digest_hold is not None:
+            return self.digest_hold[0]
+        return self.log_cursor
+
+
+    async def safe_log_watcher_task(self, source):
         """Защищенная версия задачи мониторинга логов"""
-        queue = asyncio.Queue()
+        # Ограниченная очередь: если обработка отстаёт, чтение из источника ждёт
+        queue = asyncio.Queue(maxsize=100)
         loop = asyncio.get_running_loop()
+        reader_task = None
+
+        if self.log_cursor is None:
+            self.log_cursor = await get_bot_state(source.cursor_key)
+        saved_cursor = self.log_cursor
+        saved_at = loop.time()
 
         try:
-            while True:
-                if await is_server_running():
-                    if not hasattr(self, '_ssh_reader_running'):
-                        loop.run_in_executor(
-                            None, 
-                            ssh_log_reader, 
-                            host, port, user, password, queue, loop
-                        )
-                        self._ssh_reader_running = True
+            reader_task = asyncio.create_task(source.run(queue, lambda: self.log_cursor))
 
-                    try:
-                        line = await asyncio.wait_for(queue.get(), timeout=1.0)
-                        await process_log_line(line)
-                    except asyncio.TimeoutError:
-                        continue
-                else:
-                    if hasattr(self, '_ssh_reader_running'):
-                        del self._ssh_reader_running
-                    await asyncio.sleep(5)
+            while True:
+                try:
+                    batch = await asyncio.wait_for(queue.get(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    batch = []
+                LOG_QUEUE_DEPTH.set(queue.qsize())
+
+                if batch:
+                    with LOG_BATCH_SECONDS.time():
+                        for line, cursor in batch:
+                            previous = self.log_cursor
+                            await process_log_line(line, cursor)
+                            if cursor:
+                                self.log_cursor = cursor
+                            if admin_digest.pending and self.digest_hold is None:
+                                self.digest_hold = (previous,)
+                            elif not admin_digest.pending:
+                                self.digest_hold = None
+                    LOG_LINES.inc(len(batch))
+
+                # Курсор пишется в базу не чаще раза в несколько секунд
+                durable = self.durable_cursor()
+                if durable and durable != saved_cursor and loop.time() - saved_at >= 5:
+                    await set_bot_state(source.cursor_key, durable)
+                    saved_cursor, saved_at = durable, loop.time()
         except asyncio.CancelledError:
+            durable = self.durable_cursor()
+            if durable and durable != saved_cursor:
+                await set_bot_state(source.cursor_key, durable)
             logging.info("Log watcher task cancelled")
-            raise
\ No newline at end of file
+            raise
+        finally:
+            if reader_task:
+                reader_task.cancel()
+                await asyncio.gather(reader_task, return_exceptions=True)
@@ -0,0 +1,190 @@
+import asyncio
+import logging
+from contextlib import aclosing
+from dataclasses import dataclass
+
+import paramiko
+
+from app.utils.metrics import metrics
+
+
+SSH_RECONNECTS = metrics.counter("ssh_reconnects_total", "Переподключения SSH после обрыва транспорта")
+
+
+def _connect(host, port, user, password, timeout) -> paramiko.SSHClient:
+    client = paramiko.SSHClient()
+    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    client.connect(hostname=host, port=port, username=user, password=password, timeout=timeout)
+    return client
+
+
+async def open_ssh_client(host, port, user, password, timeout=10) -> paramiko.SSHClient:
+    """Подключение и авторизация (блокирующий handshake paramiko выполняется в потоке один раз)."""
+    return await asyncio.to_thread(_connect, host, port, user, password, timeout)
+
+
+async def _exec_channel(transport: paramiko.Transport, command: str, timeout=10) -> paramiko.Channel:
+    channel = await asyncio.to_thread(transport.open_session, timeout=timeout)
+    try:
+        await asyncio.to_thread(channel.exec_command, command)
+    except BaseException:
+        channel.close()
+        raise
+    channel.setblocking(False)
+    return channel
+
+
+async def _channel_chunks(channel: paramiko.Channel, chunk_size=65536):
+    """
+    Асинхронный итератор по кускам вывода канала: пары (stdout, stderr) в байтах.
+
+    Канал должен быть в неблокирующем режиме; о новых данных сообщает его
+    `fileno()`, поэтому чтение идёт прямо в event loop без выделенного потока.
+    """
+    loop = asyncio.get_running_loop()
+    readable = asyncio.Event()
+    fd = channel.fileno()
+    loop.add_reader(fd, readable.set)
+    try:
+        while True:
+            await readable.wait()
+            readable.clear()
+
+            out, err = [], []
+            while channel.recv_ready():
+                out.append(channel.recv(chunk_size))
+            while channel.recv_stderr_ready():
+                err.append(channel.recv_stderr(chunk_size))
+            if out or err:
+                yield b"".join(out), b"".join(err)
+
+            if (channel.eof_received or channel.closed) and not channel.recv_ready() and not channel.recv_stderr_ready():
+                return
+    finally:
+        loop.remove_reader(fd)
+
+
+async def _stream_channel(channel: paramiko.Channel, chunk_size=65536):
+    """Пачки строк stdout; каждая итерация отдаёт список строк, пришедших одним куском."""
+    buffer = b""
+    try:
+        # aclosing: reader снимается с fd до channel.close(), а не когда-нибудь сборщиком мусора
+        async with aclosing(_channel_chunks(channel, chunk_size)) as chunks:
+            async for out, _ in chunks:
+                if not out:
+                    continue
+                buffer += out
+                *lines, buffer = buffer.split(b"\n")
+                if lines:
+                    yield [line.decode("utf8", errors="replace") for line in lines]
+
+        if buffer:
+            yield [buffer.decode("utf8", errors="replace")]
+        status = channel.exit_status if channel.exit_status_ready() else "неизвестен"
+        logging.info(f"SSH: команда завершилась (код {status})")
+    finally:
+        channel.close()
+
+
+@dataclass
+class SshResult:
+    exit_status: int | None
+    stdout: str
+    stderr: str
+
+
+class SshSessionManager:
+    """
+    Одно авторизованное SSH-соединение на весь бот.
+
+    Транспорт поднимается при первой команде и держится открытым (keepalive),
+    каждая команда получает свой exec-канал поверх него, поэтому команды
+    из обработчиков и чтение журнала идут параллельно без повторного
+    обмена ключами и авторизации. Оборванный транспорт переподключается
+    при следующем обращении.
+    """
+
+    def __init__(self, host, port, user, password, resolve=None, connect_timeout=10, keepalive=30):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.resolve = resolve
+        self.connect_timeout = connect_timeout
+        self.keepalive = keepalive
+        self.reconnects = 0
+        self._client: paramiko.SSHClient | None = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def connected(self) -> bool:
+        transport = self._client.get_transport() if self._client else None
+        return transport is not None and transport.is_active()
+
+    async def _transport(self) -> paramiko.Transport:
+        async with self._lock:
+            if not self.connected:
+                if self._client is not None:
+                    self.reconnects += 1
+                    SSH_RECONNECTS.inc()
+                    self._drop()
+                host = await self.resolve(self.host) if self.resolve else self.host
+                self._client = await open_ssh_client(host, self.port, self.user, self.password, self.connect_timeout)
+                self._client.get_transport().set_keepalive(self.keepalive)
+                logging.info(f"SSH: соединение с {host}:{self.port} установлено")
+            return self._client.get_transport()
+
+    def _drop(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    async def _open(self, command: str) -> paramiko.Channel:
+        transport = await self._transport()
+        try:
+            return await _exec_channel(transport, command, self.connect_timeout)
+        except (paramiko.SSHException, EOFError, OSError):
+            if transport.is_active():
+                # Отказ одного канала (например, упёрлись в MaxSessions): транспорт общий
+                # с чтением журнала, поэтому ошибка уходит вызывающему, соединение остаётся
+                raise
+            # Транспорт умер между проверкой и открытием канала — переподключение и одна повторная попытка
+            return await _exec_channel(await self._transport(), command, self.connect_timeout)
+
+    async def run(self, command: str, timeout=30) -> SshResult:
+        """Выполнить команду и дождаться завершения; по таймауту канал закрывается и бросается TimeoutError."""
+        channel = await self._open(command)
+        out, err = [], []
+
+        async def collect():
+            async with aclosing(_channel_chunks(channel)) as chunks:
+                async for stdout, stderr in chunks:
+                    out.append(stdout)
+                    err.append(stderr)
+
+        try:
+            await asyncio.wait_for(collect(), timeout=timeout)
+            # Код возврата сервер присылает уже после EOF
+            for _ in range(50):
+                if channel.exit_status_ready() or channel.closed:
+                    break
+                await asyncio.sleep(0.02)
+            status = channel.exit_status if channel.exit_status_ready() else None
+        finally:
+            channel.close()
+        return SshResult(
+            exit_status=status,
+            stdout=b"".join(out).decode("utf8", errors="replace"),
+            stderr=b"".join(err).decode("utf8", errors="replace")
+        )
+
+    async def stream(self, command: str, chunk_size=65536):
+        """Асинхронный итератор по пачкам строк вывода долгоживущей команды (например, journalctl -f)."""
+        channel = await self._open(command)
+        async with aclosing(_stream_channel(channel, chunk_size)) as batches:
+            async for lines in batches:
+                yield lines
+
+    async def close(self):
+        async with self._lock:
+            self._drop()
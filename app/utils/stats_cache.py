@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+from app.utils.player_stats import PlayerStats
+
+
+class StatsCache:
+    """
+    Кэш статистики игроков перед RCON.
+
+    * свежая запись (моложе `ttl`) отдаётся сразу;
+    * устаревшая отдаётся сразу, а в фоне запускается обновление (stale-while-revalidate);
+    * при промахе статистика запрашивается с сервера, при недоступности сервера —
+      берётся последний снимок из базы;
+    * при переполнении вытесняется давно не запрашивавшаяся запись (LRU).
+
+    `fetch(names)` запрашивает живую статистику, `load(name)` читает снимок из базы,
+    `save(stats)` сохраняет снимок, `known_names()` отдаёт ники для фонового обновления.
+    """
+
+    def __init__(self, fetch, load, save, known_names, ttl=60.0, max_entries=512,
+                 refresh_interval=300.0, refresh_batch=16):
+        self.fetch = fetch
+        self.load = load
+        self.save = save
+        self.known_names = known_names
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.refresh_interval = refresh_interval
+        self.refresh_batch = refresh_batch
+
+        self._entries: OrderedDict[str, tuple[PlayerStats, float]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    def _key(mc_name: str) -> str:
+        return mc_name.lower()
+
+    def _put(self, stats: PlayerStats, fetched_at: float | None = None):
+        key = self._key(stats.mc_name)
+        self._entries[key] = (stats, fetched_at if fetched_at is not None else time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, mc_name: str):
+        self._entries.pop(self._key(mc_name), None)
+
+    async def _refresh(self, mc_names: list[str]) -> dict[str, PlayerStats]:
+        result = await self.fetch(mc_names)
+        now = time.monotonic()
+        for stats in result.values():
+            self._put(stats, now)
+        await self.save(list(result.values()))
+        return result
+
+    def _refresh_one(self, mc_name: str) -> asyncio.Task:
+        # Один запрос к серверу на ник, сколько бы пользователей его ни ждало
+        key = self._key(mc_name)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._refresh([mc_name]))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return task
+
+    async def get(self, mc_name: str, online=True) -> PlayerStats | None:
+        """Статистика игрока; None, если сервер недоступен и снимка нет."""
+        key = self._key(mc_name)
+        entry = self._entries.get(key)
+
+        if entry is not None:
+            stats, fetched_at = entry
+            self._entries.move_to_end(key)
+            if online and time.monotonic() - fetched_at >= self.ttl:
+                task = self._refresh_one(mc_name)
+                task.add_done_callback(self._log_background_error)
+            return stats
+
+        if online:
+            try:
+                result = await asyncio.shield(self._refresh_one(mc_name))
+                return next(iter(result.values()))
+            except Exception as e:
+                logging.warning(f"Статистика {mc_name} не получена с сервера, берём снимок: {e}")
+
+        stats = await self.load(mc_name)
+        if stats is not None:
+            # Снимок из базы считаем устаревшим, чтобы при живом сервере его сразу обновить
+            self._put(stats, time.monotonic() - self.ttl)
+        return stats
+
+    @staticmethod
+    def _log_background_error(task: asyncio.Task):
+        if not task.cancelled() and task.exception():
+            logging.warning(f"Фоновое обновление статистики не удалось: {task.exception()}")
+
+    async def refresh_loop(self):
+        """Периодический снимок всех целей табло для всех известных ников."""
+        try:
+            while True:
+                try:
+                    names = await self.known_names()
+                    for i in range(0, len(names), self.refresh_batch):
+                        await self._refresh(names[i:i + self.refresh_batch])
+                    logging.info(f"[stats] Снимок статистики обновлён для {len(names)} игроков")
+                except Exception as e:
+                    logging.error(f"[stats] Ошибка обновления снимка: {e}")
+                await asyncio.sleep(self.refresh_interval)
+        except asyncio.CancelledError:
+            logging.info("Stats refresh task cancelled")
+            raise
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+
+
+@dataclass
+class ServerState:
+    online: bool = False
+    latency_ms: float | None = None
+    players_online: int = 0
+    players_max: int = 0
+    version: str | None = None
+    motd: str | None = None
+    checked_at: float = field(default_factory=time.monotonic)
+
+
+class StatusMonitor:
+    """
+    Единая точка опроса статуса Minecraft сервера.
+
+    Сервер опрашивается раз в `interval` секунд одной задачей `run()`, последнее
+    состояние доступно всем через `state`, а подписчики получают каждое новое
+    состояние в свою очередь без дополнительных сетевых запросов.
+    """
+
+    def __init__(self, probe, interval=10.0):
+        self.probe = probe
+        self.interval = interval
+        self.state: ServerState | None = None
+
+        self._subscribers: set[asyncio.Queue] = set()
+        self._probe_lock = asyncio.Lock()
+
+    async def refresh(self) -> ServerState:
+        """Опросить сервер сейчас; параллельные вызовы ждут один общий опрос."""
+        async with self._probe_lock:
+            if self.state is not None and time.monotonic() - self.state.checked_at < 1.0:
+                return self.state
+            try:
+                state = await self.probe()
+            except Exception as e:
+                logging.error(f"Server check error: {e}")
+                state = ServerState(online=False)
+            self._publish(state)
+            return state
+
+    def _publish(self, state: ServerState):
+        previous = self.state
+        self.state = state
+        if previous is None or previous.online != state.online:
+            logging.info(f"Статус сервера: {'онлайн' if state.online else 'офлайн'}")
+        for queue in self._subscribers:
+            queue.put_nowait(state)
+
+    async def is_online(self) -> bool:
+        if self.state is None:
+            await self.refresh()
+        return self.state.online
+
+    def subscribe(self) -> asyncio.Queue:
+        """Очередь, в которую будет приходить каждое новое состояние сервера."""
+        queue = asyncio.Queue()
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    async def updates(self):
+        """Асинхронный итератор: текущее состояние (если есть), затем результат каждого опроса."""
+        queue = self.subscribe()
+        if self.state is not None:
+            queue.put_nowait(self.state)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self.unsubscribe(queue)
+
+    async def run(self):
+        try:
+            while True:
+                await self.refresh()
+                await asyncio.sleep(self.interval)
+        except asyncio.CancelledError:
+            logging.info("Status monitor cancelled")
+            raise
@@ -0,0 +1,40 @@
+import time
+from collections import OrderedDict
+
+
+class UserCache:
+    """
+    Кэш строк users по Telegram ID с TTL и вытеснением самых старых записей.
+
+    Все функции, меняющие пользователя в базе, кладут сюда свежую версию
+    (write-through), поэтому TTL нужен лишь как страховка от правок базы
+    в обход бота.
+    """
+
+    def __init__(self, ttl=300.0, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[int, tuple[object, float]] = OrderedDict()
+
+    def get(self, tg_id: int):
+        entry = self._entries.get(tg_id)
+        if entry is None or time.monotonic() - entry[1] > self.ttl:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(tg_id)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, user):
+        self._entries[user.tg_id] = (user, time.monotonic())
+        self._entries.move_to_end(user.tg_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, tg_id: int):
+        self._entries.pop(tg_id, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from app.utils.metrics import metrics
+
+
+WEBHOOK_IN_FLIGHT = metrics.gauge("webhook_updates_in_flight", "Апдейты из webhook в обработке")
+WEBHOOK_UNAUTHORIZED = metrics.counter("webhook_unauthorized_total", "Запросы на webhook с неверным секретом")
+
+
+class LimitedRequestHandler(SimpleRequestHandler):
+    """
+    Приём апдейтов от Telegram с ограничением одновременной обработки.
+
+    Апдейт обрабатывается в фоне, Telegram сразу получает ответ. Если заняты все
+    `max_concurrent` слоты, ответ задерживается до освобождения слота — Telegram
+    не шлёт больше апдейтов, чем открыто соединений, и сам притормаживает.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, secret_token: str, max_concurrent=40, **data: Any):
+        super().__init__(dispatcher, bot, handle_in_background=True, secret_token=secret_token, **data)
+        self.max_concurrent = max_concurrent
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self.in_flight = 0
+
+    def verify_secret(self, telegram_secret_token: str, bot: Bot) -> bool:
+        if super().verify_secret(telegram_secret_token, bot):
+            return True
+        WEBHOOK_UNAUTHORIZED.inc()
+        return False
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        update = await request.json(loads=bot.session.json_loads)
+        await self._slots.acquire()
+        self.in_flight += 1
+        WEBHOOK_IN_FLIGHT.inc()
+        task = asyncio.create_task(self._background_feed_update(bot=bot, update=update))
+        self._background_feed_update_tasks.add(task)
+        task.add_done_callback(self._release)
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    def _release(self, task: asyncio.Task):
+        self._background_feed_update_tasks.discard(task)
+        self.in_flight -= 1
+        WEBHOOK_IN_FLIGHT.dec()
+        self._slots.release()
+        if not task.cancelled() and task.exception():
+            logging.error(f"Ошибка обработки апдейта из webhook: {task.exception()}")
+
+
+async def start_webhook_server(
+    dp: Dispatcher,
+    bot: Bot,
+    secret_token: str,
+    host="127.0.0.1",
+    port=8080,
+    path="/webhook",
+    max_concurrent=40
+) -> web.AppRunner:
+    """
+    HTTP-сервер для апдейтов на `path` и проверки живости на /health.
+    Возвращает runner, который нужно закрыть через `await runner.cleanup()`.
+    """
+    handler = LimitedRequestHandler(dp, bot, secret_token=secret_token, max_concurrent=max_concurrent)
+
+    async def health(request: web.Request) -> web.Response:
+        return web.json_response({
+            "status": "ok",
+            "in_flight": handler.in_flight,
+            "max_concurrent": handler.max_concurrent
+        })
+
+    app = web.Application()
+    handler.register(app, path=path)
+    app.router.add_get("/health", health)
+    # Старт и остановка приложения запускают startup/shutdown диспетчера, как при polling
+    setup_application(app, dp, bot=bot)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logging.info(f"Webhook слушает http://{host}:{port}{path}, проверка живости на /health")
+    return runner
@@ -0,0 +1,101 @@
+"""
+Конкурентная запись в SQLite: движок по умолчанию против create_db_engine (WAL и прагмы).
+
+Каждый писатель в своей сессии делает upsert строки пользователя и читает её
+обратно, как обработчики подписки и смены ника. Считаются пропускная
+способность, задержки и ошибки "database is locked".
+
+Запуск из корня проекта:
+    python -m benchmarks.db_write_bench [--writers 32] [--ops 50]
+"""
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import BigInteger, Boolean, String, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+from app.database.engine import create_db_engine, upsert
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class BenchUser(Base):
+    __tablename__ = "users"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    tg_id = mapped_column(BigInteger, unique=True)
+    mc_name = mapped_column(String(50))
+    is_subscribed: Mapped[bool] = mapped_column(Boolean, default=False)
+
+
+async def writer(engine, session_factory, writer_id: int, ops: int, latencies: list[float], errors: list[str]):
+    for op in range(ops):
+        tg_id = writer_id * 1000 + op % 10
+        stmt = upsert(engine, BenchUser).values(tg_id=tg_id, mc_name=f"p{writer_id}_{op}", is_subscribed=op % 2 == 0)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[BenchUser.tg_id],
+            set_={"mc_name": stmt.excluded.mc_name, "is_subscribed": stmt.excluded.is_subscribed}
+        )
+        started = time.perf_counter()
+        try:
+            async with session_factory() as session:
+                await session.execute(stmt)
+                await session.commit()
+                await session.scalar(select(BenchUser.mc_name).where(BenchUser.tg_id == tg_id))
+        except OperationalError as e:
+            errors.append(str(e.orig))
+            continue
+        latencies.append(time.perf_counter() - started)
+
+
+async def run_case(name: str, engine, writers: int, ops: int):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine)
+
+    latencies: list[float] = []
+    errors: list[str] = []
+    started = time.perf_counter()
+    await asyncio.gather(*(writer(engine, session_factory, i, ops, latencies, errors) for i in range(writers)))
+    elapsed = time.perf_counter() - started
+    await engine.dispose()
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0
+    print(
+        f"{name:<18} {len(latencies) / elapsed:>8.0f} оп/с"
+        f"  медиана {statistics.median(latencies) * 1000 if latencies else 0:>6.1f} мс"
+        f"  p95 {p95 * 1000:>7.1f} мс"
+        f"  ошибок: {len(errors)}"
+    )
+    for message in sorted(set(errors))[:3]:
+        print(f"  {message}")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", type=int, default=32)
+    parser.add_argument("--ops", type=int, default=50)
+    parser.add_argument("--pool-size", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"Писателей: {args.writers}, операций на писателя: {args.ops}")
+    with tempfile.TemporaryDirectory() as directory:
+        default_url = f"sqlite+aiosqlite:///{Path(directory) / 'default.sqlite3'}"
+        tuned_url = f"sqlite+aiosqlite:///{Path(directory) / 'tuned.sqlite3'}"
+
+        default = create_async_engine(default_url, pool_size=args.pool_size, max_overflow=args.pool_size)
+        await run_case("по умолчанию", default, args.writers, args.ops)
+        await run_case("WAL + прагмы", create_db_engine(tuned_url, pool_size=args.pool_size), args.writers, args.ops)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
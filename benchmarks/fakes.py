@@ -0,0 +1,313 @@
+"""
+Локальные заменители Minecraft сервера для бенчмарков и нагрузочных тестов:
+RCON-сервер, ответчик Server List Ping, SSH-сервер, проигрыватель лога и
+сессия Bot API без сети.
+"""
+import asyncio
+import json
+import os
+import socket
+import struct
+import threading
+import time
+from pathlib import Path
+
+import paramiko
+from aiogram.client.session.base import BaseSession
+
+from app.utils.rcon_utils import encode_packet
+
+
+# Ники из корпуса benchmarks/data/server_log.txt, чтобы смерти из лога находили владельцев
+PLAYERS = ["Steve", "Alex", "kirill_pro", "vladmav", "Dimon", "Notch_2"]
+
+
+def bench_environment(rcon_port: int, status_port: int, ssh_port: int, database_path: str | Path, log_path: str | Path):
+    """
+    Настройки бота, указывающие на заменители. Вызывать до импорта модулей app,
+    которые читают config (переменные окружения важнее .env).
+    """
+    os.environ.update({
+        "BOT_TOKEN": "123456:bench-token",
+        "ADMIN_ID": "1",
+        "MC_HOST": "127.0.0.1",
+        "MC_PORT": str(status_port),
+        "RCON_PORT": str(rcon_port),
+        "RCON_PASS": FakeRconServer.password,
+        "SSH_USER": "bench",
+        "SSH_PASS": "bench",
+        "SSH_PORT": str(ssh_port),
+        "DATABASE_URL": f"sqlite+aiosqlite:///{database_path}",
+        "LOG_SOURCE": "file",
+        "LOG_FILE_PATH": str(log_path),
+        "METRICS_PORT": "0",
+    })
+
+
+class FakeRconServer:
+    """Source RCON: отвечает на команды, которые использует бот, с настраиваемой задержкой."""
+
+    password = "bench"
+
+    def __init__(self, latency=0.0, players=PLAYERS):
+        self.latency = latency
+        self.players = list(players)
+        self.commands = 0
+        self.port = None
+        self._server = None
+
+    def respond(self, command: str) -> str:
+        words = command.lstrip("/").split()
+        if not words:
+            return ""
+        if words[0] == "list":
+            return f"There are {len(self.players)} of a max of 20 players online: {', '.join(self.players)}"
+        if words[0] == "tps":
+            return "§6TPS from last 1m, 5m, 15m: §a20.0, §a19.97, §a20.0"
+        if words[0] == "save-all":
+            return "Saving the game (this may take a moment!)Saved the game"
+        if words[:3] == ["scoreboard", "players", "get"] and len(words) == 5:
+            name, objective = words[3], words[4]
+            return f"{name} has {sum(map(ord, name + objective)) % 1000} [{objective}]"
+        if words[:3] == ["scoreboard", "players", "list"]:
+            return f"There are {len(self.players)} tracked entity/entities: {', '.join(self.players)}"
+        if words[:2] == ["data", "get"] and "LastDeathLocation" in words:
+            return f"{words[3]} has the following entity data: {{pos: [I; 10, 64, -20], dimension: \"minecraft:overworld\"}}"
+        return f"Unknown or incomplete command, see below for error{command}<--[HERE]"
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                (length,) = struct.unpack("<i", await reader.readexactly(4))
+                payload = await reader.readexactly(length)
+                request_id, packet_type = struct.unpack("<ii", payload[:8])
+                body = payload[8:-2].decode("utf8")
+                if packet_type == 3:
+                    writer.write(encode_packet(request_id if body == self.password else -1, 2, ""))
+                else:
+                    self.commands += 1
+                    if self.latency:
+                        await asyncio.sleep(self.latency)
+                    writer.write(encode_packet(request_id, 0, self.respond(body)))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self) -> int:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+
+def _write_varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+async def _read_varint(reader: asyncio.StreamReader) -> int:
+    value = 0
+    for shift in range(0, 35, 7):
+        byte = (await reader.readexactly(1))[0]
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value
+    raise ValueError("VarInt слишком длинный")
+
+
+class FakeStatusServer:
+    """Ответчик Server List Ping (протокол статуса Java Edition)."""
+
+    def __init__(self, players=PLAYERS, latency=0.0):
+        self.players = list(players)
+        self.latency = latency
+        self.port = None
+        self._server = None
+
+    def status_json(self) -> str:
+        return json.dumps({
+            "version": {"name": "1.21.1", "protocol": 767},
+            "players": {
+                "max": 20,
+                "online": len(self.players),
+                "sample": [{"name": name, "id": "00000000-0000-0000-0000-000000000000"} for name in self.players]
+            },
+            "description": {"text": "Bench server"}
+        })
+
+    @staticmethod
+    def _packet(packet_id: int, data: bytes) -> bytes:
+        body = _write_varint(packet_id) + data
+        return _write_varint(len(body)) + body
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                length = await _read_varint(reader)
+                payload = await reader.readexactly(length)
+                packet_id = payload[0]
+                if packet_id == 0 and len(payload) == 1:
+                    # Запрос статуса (рукопожатие с тем же id 0 длиннее одного байта и ответа не требует)
+                    if self.latency:
+                        await asyncio.sleep(self.latency)
+                    status = self.status_json().encode("utf8")
+                    writer.write(self._packet(0, _write_varint(len(status)) + status))
+                elif packet_id == 1:
+                    writer.write(self._packet(1, payload[1:]))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self) -> int:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+
+class _SshInterface(paramiko.ServerInterface):
+    def __init__(self):
+        self.commands: dict[int, str] = {}
+        self.ready = threading.Condition()
+
+    def check_auth_password(self, username, password):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_channel_request(self, kind, chanid):
+        return paramiko.OPEN_SUCCEEDED
+
+    def check_channel_exec_request(self, channel, command):
+        with self.ready:
+            self.commands[channel.get_id()] = command.decode("utf8")
+            self.ready.notify_all()
+        return True
+
+
+class FakeSshServer:
+    """
+    SSH-сервер на paramiko в фоновых потоках. Любая команда выполняется как
+    `echo`: в stdout уходит сама команда, код возврата 0.
+    """
+
+    def __init__(self):
+        self.host_key = paramiko.RSAKey.generate(2048)
+        self.port = None
+        self.connections = 0
+        self._socket = None
+
+    def _run_command(self, channel: paramiko.Channel, command: str):
+        channel.sendall(command.encode("utf8") + b"\n")
+        channel.send_exit_status(0)
+        channel.shutdown_write()
+        channel.close()
+
+    def _serve_connection(self, sock: socket.socket):
+        transport = paramiko.Transport(sock)
+        transport.add_server_key(self.host_key)
+        interface = _SshInterface()
+        transport.start_server(server=interface)
+        while transport.is_active():
+            channel = transport.accept(1)
+            if channel is None:
+                continue
+            with interface.ready:
+                interface.ready.wait_for(lambda: channel.get_id() in interface.commands, timeout=5)
+                command = interface.commands.pop(channel.get_id(), "")
+            threading.Thread(target=self._run_command, args=(channel, command), daemon=True).start()
+
+    def _accept_loop(self):
+        while True:
+            try:
+                sock, _ = self._socket.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self._serve_connection, args=(sock,), daemon=True).start()
+
+    def start(self) -> int:
+        self._socket = socket.socket()
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind(("127.0.0.1", 0))
+        self._socket.listen(8)
+        self.port = self._socket.getsockname()[1]
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        return self.port
+
+    def close(self):
+        self._socket.close()
+
+
+class LogReplayer:
+    """Дописывает строки корпуса в файл лога, как это делает сервер, — для FileTailSource."""
+
+    def __init__(self, path: str | Path, lines: list[str]):
+        self.path = Path(path)
+        self.lines = lines
+
+    def reset(self):
+        self.path.write_text("", encoding="utf8")
+
+    async def replay(self, repeat=1, chunk=500, rate: float | None = None):
+        """Записать корпус `repeat` раз пачками по `chunk` строк; `rate` — строк в секунду (None — без пауз)."""
+        started = time.perf_counter()
+        written = 0
+        with self.path.open("a", encoding="utf8") as file:
+            for _ in range(repeat):
+                for i in range(0, len(self.lines), chunk):
+                    part = self.lines[i:i + chunk]
+                    file.write("\n".join(part) + "\n")
+                    file.flush()
+                    written += len(part)
+                    if rate:
+                        delay = written / rate - (time.perf_counter() - started)
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+                    else:
+                        await asyncio.sleep(0)
+        return written
+
+
+class FakeTelegramSession(BaseSession):
+    """
+    Сессия Bot API без сети: каждый запрос ждёт `latency` секунд (время ответа
+    Telegram) и возвращает пустой успешный результат. Считает вызовы по методам.
+    """
+
+    def __init__(self, latency=0.0):
+        super().__init__()
+        self.latency = latency
+        self.calls: dict[str, int] = {}
+
+    async def make_request(self, bot, method, timeout=None):
+        name = type(method).__name__
+        self.calls[name] = self.calls.get(name, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        # Обработчики результат вызовов не используют, достаточно правдоподобного значения
+        return True if method.__returning__ is bool else None
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self):
+        pass
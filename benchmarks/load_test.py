@@ -0,0 +1,231 @@
+"""
+Нагрузочный тест обработчиков: сколько одновременных нажатий кнопок выдерживает бот.
+
+Dispatcher настраивается так же, как в run.py (middleware + router из
+app/handlers.py), и получает синтетические апдейты через feed_update. Запросы
+к Bot API уходят в FakeTelegramSession, RCON и статус сервера — в заменители
+из benchmarks/fakes.py, база — временная SQLite.
+
+Тысячи пользователей нажимают server_stats, my_stat и подписку/отписку;
+нагрузка поднимается ступенями: на каждой ступени одновременно обрабатывается
+заданное число апдейтов (как при polling, где каждый апдейт — отдельная задача).
+Для ступени выводятся пропускная способность и задержки p50/p95/p99 от
+получения апдейта до конца обработки.
+
+Запуск из корня проекта:
+    python -m benchmarks.load_test [--users 5000] [--updates 5000]
+        [--concurrency 1 10 50 100 250 500] [--api-latency 0] [--output load.json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+from aiogram.types import Update
+
+from benchmarks.fakes import FakeRconServer, FakeStatusServer, FakeTelegramSession, bench_environment
+from benchmarks.suite import percentile
+
+
+# Доля каждой кнопки в потоке нажатий
+ACTIONS = {
+    "server_stats": 0.4,
+    "my_stat": 0.3,
+    "subscribe_notifications": 0.15,
+    "unsubscribe_notifications": 0.15,
+}
+
+
+class UpdateFactory:
+    """Апдейты callback_query от случайных пользователей, как при нажатии инлайн-кнопки в меню бота."""
+
+    def __init__(self, users: int, seed=0):
+        self.users = users
+        self.random = random.Random(seed)
+        self.update_id = 0
+
+    def callback(self, tg_id: int, data: str) -> Update:
+        self.update_id += 1
+        return Update.model_validate({
+            "update_id": self.update_id,
+            "callback_query": {
+                "id": str(self.update_id),
+                "chat_instance": str(tg_id),
+                "data": data,
+                "from": {"id": tg_id, "is_bot": False, "first_name": "Игрок", "last_name": str(tg_id), "username": f"user{tg_id}"},
+                "message": {
+                    "message_id": 1,
+                    "date": 0,
+                    "chat": {"id": tg_id, "type": "private"},
+                    "from": {"id": 1, "is_bot": True, "first_name": "Bot"},
+                    "text": "Меню"
+                }
+            }
+        })
+
+    def next(self) -> tuple[str, Update]:
+        action = self.random.choices(list(ACTIONS), weights=list(ACTIONS.values()))[0]
+        return action, self.callback(self.random.randint(1, self.users), action)
+
+
+def summarize(latencies: list[float], elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    if not latencies:
+        return {"updates": 0}
+    return {
+        "updates": len(latencies),
+        "updates_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+async def run_level(dp, bot, factory: UpdateFactory, updates: int, concurrency: int) -> dict:
+    latencies: list[float] = []
+    by_action: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    remaining = updates
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            action, update = factory.next()
+            started = time.perf_counter()
+            try:
+                await dp.feed_update(bot, update)
+            except Exception as e:
+                errors[type(e).__name__] += 1
+                continue
+            latency = time.perf_counter() - started
+            latencies.append(latency)
+            by_action[action].append(latency)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    result = {"concurrency": concurrency, **summarize(latencies, elapsed), "errors": dict(errors)}
+    result["actions"] = {action: summarize(values, elapsed) for action, values in sorted(by_action.items())}
+    return result
+
+
+async def prepare_users(users: int, linked_share: float):
+    """Пользователи в базе; часть с привязанным ником, чтобы my_stat доходил до статистики."""
+    import app.database.requests as rq
+
+    for tg_id in range(1, users + 1):
+        await rq.upsert_user(tg_id, f"Игрок {tg_id}", f"user{tg_id}")
+        if tg_id <= users * linked_share:
+            await rq.update_mc_name(tg_id, f"Player{tg_id}")
+    await rq.load_nick_registry()
+    # Обработчики должны сами ходить в базу через UserMiddleware, как после перезапуска бота
+    for tg_id in range(1, users + 1):
+        rq.user_cache.invalidate(tg_id)
+
+
+async def run(args) -> dict:
+    # Модули бота читают config при импорте, поэтому импортируются после bench_environment
+    from aiogram import Bot, Dispatcher
+
+    import app.database.requests as rq
+    from app.database.models import engine, init_db
+    from run import setup_dispatcher
+
+    await init_db()
+    await prepare_users(args.users, args.linked)
+
+    session = FakeTelegramSession(latency=args.api_latency / 1000)
+    bot = Bot(token="123456:load-test", session=session)
+    dp = Dispatcher()
+    setup_dispatcher(dp)
+    factory = UpdateFactory(args.users, seed=args.seed)
+
+    levels = []
+    try:
+        for concurrency in args.concurrency:
+            level = await run_level(dp, bot, factory, args.updates, concurrency)
+            levels.append(level)
+            errors = sum(level["errors"].values())
+            print(
+                f"параллельно {concurrency:>5}: {level.get('updates_per_sec', 0):>8.1f} апд/с"
+                f"  p50 {level.get('p50_ms', 0):>8.2f} мс  p95 {level.get('p95_ms', 0):>8.2f} мс"
+                f"  p99 {level.get('p99_ms', 0):>8.2f} мс  ошибок: {errors}"
+            )
+    finally:
+        await rq.rcon_pool.close()
+        await rq.ssh.close()
+        await engine.dispose()
+
+    print("\nЗадержка по кнопкам на последней ступени:")
+    for action, stats in levels[-1]["actions"].items():
+        print(f"  {action:<26} p50 {stats.get('p50_ms', 0):>8.2f} мс  p95 {stats.get('p95_ms', 0):>8.2f} мс  p99 {stats.get('p99_ms', 0):>8.2f} мс")
+
+    base_p95 = levels[0].get("p95_ms")
+    for level in levels[1:]:
+        if base_p95 and level.get("p95_ms", 0) > base_p95 * args.degradation:
+            print(
+                f"\np95 выросла больше чем в {args.degradation:g} раза относительно "
+                f"{levels[0]['concurrency']} параллельных нажатий уже при {level['concurrency']}"
+            )
+            break
+    else:
+        print("\nЗаметной деградации p95 на проверенных ступенях нет")
+
+    print(f"Вызовы Bot API: {dict(sorted(session.calls.items()))}")
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "users": args.users,
+            "updates_per_level": args.updates,
+            "api_latency_ms": args.api_latency,
+            "rcon_latency_ms": args.rcon_latency,
+            "actions": ACTIONS,
+        },
+        "levels": levels,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--linked", type=float, default=0.5, help="доля пользователей с привязанным ником")
+    parser.add_argument("--updates", type=int, default=5000, help="апдейтов на ступень")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50, 100, 250, 500])
+    parser.add_argument("--api-latency", type=float, default=0.0, help="время ответа Bot API, мс")
+    parser.add_argument("--rcon-latency", type=float, default=0.0, help="задержка ответа RCON, мс")
+    parser.add_argument("--degradation", type=float, default=2.0, help="во сколько раз рост p95 считается деградацией")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="куда записать результаты в JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    rcon = FakeRconServer(latency=args.rcon_latency / 1000)
+    status = FakeStatusServer()
+    await rcon.start()
+    await status.start()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # SSH обработчикам кнопок не нужен, порт 0 — никуда не подключаться
+        bench_environment(rcon.port, status.port, 0, Path(directory) / "load.sqlite3", Path(directory) / "latest.log")
+        try:
+            report = await run(args)
+        finally:
+            await rcon.close()
+            await status.close()
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf8")
+        print(f"Результаты записаны в {args.output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""
+Пропускная способность разбора строк лога: старая цепочка re.search против LogClassifier.
+
+Запуск из корня проекта:
+    python -m benchmarks.log_classifier_bench [--repeat 200]
+"""
+import argparse
+import re
+import time
+from pathlib import Path
+
+import app.text as cs
+from app.utils.log_classifier import classifier
+
+
+CORPUS = Path(__file__).parent / "data" / "server_log.txt"
+
+
+def legacy_classify(line: str):
+    """Прежний разбор из process_log_line: до пяти re.search и обход death_patterns."""
+    if 'Saved the game' in line:
+        return None
+    match = re.search(r'\]: ([^\s]+) joined the game', line)
+    if match:
+        return ("join", match.group(1))
+    match = re.search(r'\]: ([^\s]+) left the game', line)
+    if match:
+        return ("leave", match.group(1))
+    match = re.search(r'\[Not Secure\] \[Rcon\] (.+)', line)
+    if match:
+        return ("rcon", None)
+    match = re.search(r'\[Not Secure\] <([^>]+)> (.+)', line)
+    if match:
+        return ("chat", match.group(1))
+    match = re.search(r'\]: ([^\s]+): (.+)', line)
+    if match:
+        return ("chat", match.group(1))
+    for pattern in cs.death_patterns:
+        if pattern in line:
+            player_match = re.search(r'\]: \[\d{2}:\d{2}:\d{2} INFO\]: (\S+)', line)
+            return ("death", player_match.group(1) if player_match else "Игрок")
+    return None
+
+
+def new_classify(line: str):
+    event = classifier.classify(line)
+    return (event.kind, event.player if event.kind != "rcon" else None) if event else None
+
+
+def measure(func, lines: list[str], repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for line in lines:
+            func(line)
+    return len(lines) * repeat / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    lines = CORPUS.read_text(encoding="utf-8").splitlines()
+
+    differences = [line for line in lines if legacy_classify(line) != new_classify(line)]
+    legacy = measure(legacy_classify, lines, args.repeat)
+    new = measure(new_classify, lines, args.repeat)
+
+    print(f"Корпус: {len(lines)} строк x {args.repeat}")
+    print(f"re.search цепочка: {legacy:,.0f} строк/с")
+    print(f"LogClassifier:     {new:,.0f} строк/с ({new / legacy:.1f}x)")
+    print(f"Расхождений в классификации: {len(differences)}")
+    for line in differences[:5]:
+        print(f"  {legacy_classify(line)} -> {new_classify(line)}: {line}")
+
+
+if __name__ == "__main__":
+    main()
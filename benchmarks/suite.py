@@ -0,0 +1,256 @@
+"""
+Микробенчмарки горячих путей бота на локальных заменителях сервера.
+
+Поднимает RCON-сервер, ответчик Server List Ping и SSH-сервер из
+benchmarks/fakes.py, направляет на них настройки бота, создаёт временную базу
+и замеряет: статус сервера (SLP и общий монитор), RCON, SSH, get_player_stats
+(с пустым и с прогретым кэшем), process_log_line, полный путь лога
+файл -> FileTailSource -> process_log_line и чтение пользователей из базы.
+
+Результаты пишутся в JSON; с --compare сравниваются с прошлым прогоном, и при
+падении пропускной способности больше порога процесс завершается с кодом 1.
+
+Запуск из корня проекта:
+    python -m benchmarks.suite [--scale 1.0] [--output results.json] [--compare baseline.json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks.fakes import PLAYERS, FakeRconServer, FakeSshServer, FakeStatusServer, LogReplayer, bench_environment
+
+
+CORPUS = Path(__file__).parent / "data" / "server_log.txt"
+USERS = 1000
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def measure(operation, iterations: int, concurrency=1, before=None, warmup=10) -> dict:
+    """
+    Выполнить `operation()` `iterations` раз в `concurrency` параллельных потоков.
+    `before()` вызывается перед каждой операцией и в замер не входит.
+    """
+    for _ in range(min(warmup, iterations)):
+        if before:
+            before()
+        await operation()
+
+    latencies: list[float] = []
+    remaining = iterations
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            if before:
+                before()
+            started = time.perf_counter()
+            await operation()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "ops": len(latencies),
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 4),
+        "ops_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+async def run_cases(scale: float, only: list[str] | None, log_path: Path) -> dict[str, dict]:
+    # Модули бота читают config при импорте, поэтому импортируются после bench_environment
+    import app.database.requests as rq
+    from app.database.models import engine, init_db
+    from app.utils.log_sources import FileTailSource
+
+    await init_db()
+    for tg_id in range(1, USERS + 1):
+        await rq.upsert_user(tg_id, f"Bench {tg_id}", f"bench{tg_id}")
+    for tg_id, mc_name in enumerate(PLAYERS, start=1):
+        await rq.update_mc_name(tg_id, mc_name)
+    await rq.load_nick_registry()
+
+    lines = CORPUS.read_text(encoding="utf8").splitlines()
+    counter = 0
+
+    def n(iterations: int) -> int:
+        return max(1, int(iterations * scale))
+
+    def next_id() -> int:
+        nonlocal counter
+        counter += 1
+        return counter
+
+    async def process_corpus_line():
+        i = next_id()
+        # Уникальный курсор, чтобы повторы корпуса не отсеивались дедупликацией
+        await rq.process_log_line(lines[i % len(lines)], cursor=f"bench:{i}")
+
+    async def get_user(cold: bool):
+        tg_id = next_id() % USERS + 1
+        if cold:
+            rq.user_cache.invalidate(tg_id)
+        await rq.get_user(tg_id)
+
+    async def lookup_nick():
+        await rq.get_telegram_id_by_mc_name(PLAYERS[next_id() % len(PLAYERS)])
+
+    async def log_pipeline():
+        replayer = LogReplayer(log_path, lines)
+        replayer.reset()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=64)
+        source = FileTailSource(str(log_path), poll_interval=0.01)
+        # Читаем файл с начала: без курсора источник пропустил бы уже записанное
+        task = asyncio.create_task(source.stream(queue, f"{log_path.stat().st_ino}:0"))
+        expected = await replayer.replay(repeat=n(10))
+        processed = 0
+        while processed < expected:
+            for line, cursor in await queue.get():
+                await rq.process_log_line(line, cursor)
+                processed += 1
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    async def log_pipeline_case() -> dict:
+        started = time.perf_counter()
+        await log_pipeline()
+        elapsed = time.perf_counter() - started
+        total = n(10) * len(lines)
+        return {"ops": total, "concurrency": 1, "seconds": round(elapsed, 4), "ops_per_sec": round(total / elapsed, 1)}
+
+    cases = {
+        "status_probe": lambda: measure(lambda: rq.probe_server_status(), n(300)),
+        "is_server_running": lambda: measure(rq.is_server_running, n(20000)),
+        "rcon_list": lambda: measure(lambda: rq.run_rcon_command("list"), n(2000)),
+        "rcon_list_concurrent": lambda: measure(lambda: rq.run_rcon_command("list"), n(2000), concurrency=16),
+        "ssh_command": lambda: measure(lambda: rq.run_ssh_command("echo bench"), n(100)),
+        "player_stats_cold": lambda: measure(
+            lambda: rq.get_player_stats("Steve"), n(300), before=lambda: rq.stats_cache.invalidate("Steve")
+        ),
+        "player_stats_warm": lambda: measure(lambda: rq.get_player_stats("Steve"), n(20000)),
+        "process_log_line": lambda: measure(process_corpus_line, n(4000)),
+        "log_pipeline": log_pipeline_case,
+        "get_user_cold": lambda: measure(lambda: get_user(cold=True), n(2000)),
+        "get_user_warm": lambda: measure(lambda: get_user(cold=False), n(20000)),
+        "nick_lookup": lambda: measure(lookup_nick, n(20000)),
+    }
+
+    results = {}
+    try:
+        for name, case in cases.items():
+            if only and name not in only:
+                continue
+            results[name] = await case()
+            print_result(name, results[name])
+    finally:
+        await rq.rcon_pool.close()
+        await rq.ssh.close()
+        await engine.dispose()
+    return results
+
+
+def print_result(name: str, result: dict):
+    line = f"{name:<22} {result['ops_per_sec']:>10.1f} оп/с"
+    if "p50_ms" in result:
+        line += f"  p50 {result['p50_ms']:>8.3f} мс  p95 {result['p95_ms']:>8.3f} мс  p99 {result['p99_ms']:>8.3f} мс"
+    print(line)
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict[str, dict], baseline: dict[str, dict], threshold: float) -> list[str]:
+    """Случаи, где пропускная способность упала больше чем на `threshold` относительно базовой."""
+    regressions = []
+    print(f"\nСравнение с базовым прогоном (порог {threshold:.0%}):")
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<22} нет в базовом прогоне")
+            continue
+        change = result["ops_per_sec"] / base["ops_per_sec"] - 1
+        mark = ""
+        if change < -threshold:
+            mark = "  РЕГРЕССИЯ"
+            regressions.append(name)
+        print(f"{name:<22} {base['ops_per_sec']:>10.1f} -> {result['ops_per_sec']:>10.1f} оп/с ({change:+.1%}){mark}")
+    return regressions
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=float, default=1.0, help="множитель числа итераций")
+    parser.add_argument("--only", nargs="*", help="запустить только эти случаи")
+    parser.add_argument("--rcon-latency", type=float, default=0.0, help="задержка ответа RCON, мс")
+    parser.add_argument("--output", type=Path, help="куда записать результаты в JSON")
+    parser.add_argument("--compare", type=Path, help="JSON прошлого прогона для сравнения")
+    parser.add_argument("--threshold", type=float, default=0.15, help="допустимое падение оп/с, доля")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    rcon = FakeRconServer(latency=args.rcon_latency / 1000)
+    status = FakeStatusServer()
+    ssh = FakeSshServer()
+    await rcon.start()
+    await status.start()
+    ssh.start()
+
+    with tempfile.TemporaryDirectory() as directory:
+        log_path = Path(directory) / "latest.log"
+        bench_environment(rcon.port, status.port, ssh.port, Path(directory) / "bench.sqlite3", log_path)
+        try:
+            results = await run_cases(args.scale, args.only, log_path)
+        finally:
+            await rcon.close()
+            await status.close()
+            ssh.close()
+
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scale": args.scale,
+            "rcon_latency_ms": args.rcon_latency,
+        },
+        "results": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf8")
+        print(f"\nРезультаты записаны в {args.output}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf8"))["results"]
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -12,6 +12,42 @@ class Settings(BaseSettings):
     ssh_user: SecretStr
     ssh_pass: SecretStr
     ssh_port: int
+    # Политики событий для админ-чата: immediate / batched / drop
+    digest_policies: dict[str, str] = {
+        "death": "immediate",
+        "join": "batched",
+        "leave": "batched",
+        "chat": "batched",
+        "rcon": "batched",
+    }
+    digest_window: float = 30.0
+    digest_max_events: int = 30
+    # Сколько последних строк лога помнить для отсева повторов
+    log_dedup_size: int = 1000
+    # Откуда читать лог сервера: ssh (journalctl по SSH), journald (локальный journalctl), file (logs/latest.log)
+    log_source: str = "ssh"
+    journal_unit: str = "minecraft"
+    log_file_path: str = "logs/latest.log"
+    # База данных: по умолчанию SQLite рядом с ботом, для больших установок — postgresql+asyncpg://...
+    database_url: str = "sqlite+aiosqlite:///db.sqlite3"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 268435456
+    sqlite_cache_size: int = -20000
+    db_pool_size: int = 5
+    # Эндпоинт метрик Prometheus (/metrics); 0 — не запускать
+    metrics_host: str = "127.0.0.1"
+    metrics_port: int = 9108
+    # Получение апдейтов: polling или webhook (бот за reverse proxy)
+    bot_mode: str = "polling"
+    # Публичный адрес бота без пути, например https://bot.example.com; обязателен для webhook
+    webhook_base_url: str = ""
+    webhook_path: str = "/webhook"
+    webhook_host: str = "127.0.0.1"
+    webhook_port: int = 8080
+    # Секрет заголовка X-Telegram-Bot-Api-Secret-Token; пустой — новый при каждом запуске
+    webhook_secret: SecretStr = SecretStr("")
+    # Сколько апдейтов обрабатывается одновременно (и сколько соединений открывает Telegram, до 100)
+    webhook_max_concurrency: int = 40
     model_config = SettingsConfigDict(env_file='.env', env_file_encoding='utf-8')
 
 
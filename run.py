@@ -1,12 +1,16 @@
 import asyncio
 import logging
+import secrets
 from aiogram import Bot, Dispatcher
 
 from config import config
 from app.handlers import router
+from app.middlewares import MetricsMiddleware, UserMiddleware
+from app.utils.metrics import metrics, start_metrics_server
+from app.utils.webhook import start_webhook_server
 from app.database.models import init_db
 from app.utils.server_task import ServerTasks
-from app.database.requests import ping_loop
+from app.database.requests import load_nick_registry, ping_loop, rcon_pool, ssh, status_monitor, outbox, admin_digest
 
 
 logging.basicConfig(
@@ -19,24 +23,78 @@ bot = Bot(token=config.bot_token.get_secret_value())
 dp = Dispatcher()
 
 
+def setup_dispatcher(dp: Dispatcher):
+    """Middleware и обработчики; общая настройка для бота и нагрузочного теста."""
+    for observer in (dp.message, dp.callback_query):
+        observer.middleware(MetricsMiddleware())
+        observer.middleware(UserMiddleware())
+    dp.include_router(router)
+
+
+async def run_polling():
+    # getUpdates не работает, пока у бота установлен webhook
+    await bot.delete_webhook()
+    await dp.start_polling(bot)
+
+
+async def run_webhook():
+    if not config.webhook_base_url:
+        raise ValueError("Для BOT_MODE=webhook нужен WEBHOOK_BASE_URL")
+    secret = config.webhook_secret.get_secret_value() or secrets.token_urlsafe(32)
+    runner = await start_webhook_server(
+        dp, bot, secret,
+        host=config.webhook_host,
+        port=config.webhook_port,
+        path=config.webhook_path,
+        max_concurrent=config.webhook_max_concurrency
+    )
+    try:
+        await bot.set_webhook(
+            url=config.webhook_base_url.rstrip("/") + config.webhook_path,
+            secret_token=secret,
+            allowed_updates=dp.resolve_used_update_types(),
+            max_connections=min(config.webhook_max_concurrency, 100)
+        )
+        logging.info(f"Webhook установлен: {config.webhook_base_url.rstrip('/')}{config.webhook_path}")
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
 async def main():
     await init_db()
-    dp.include_router(router)
+    await load_nick_registry()
+    setup_dispatcher(dp)
+    metrics_runner = None
+    if config.metrics_port:
+        metrics_runner = await start_metrics_server(metrics, config.metrics_host, config.metrics_port)
 
     tasks = [
+        asyncio.create_task(status_monitor.run()),
+        asyncio.create_task(outbox.run(bot)),
+        asyncio.create_task(admin_digest.run()),
         asyncio.create_task(ping_loop(bot)),
         asyncio.create_task(ServerTasks(bot).manage_tasks())
     ]
 
     try:
-        await dp.start_polling(bot)
+        if config.bot_mode == "webhook":
+            await run_webhook()
+        elif config.bot_mode == "polling":
+            await run_polling()
+        else:
+            raise ValueError(f"Неизвестный режим бота: {config.bot_mode}")
     except asyncio.CancelledError:
-        logging.info("Polling cancelled.")
+        logging.info(f"Получение апдейтов ({config.bot_mode}) остановлено.")
     finally:
         logging.info("Отмена всех фоновых задач...")
         for task in tasks:
             task.cancel()
         await asyncio.gather(*tasks, return_exceptions=True)
+        await rcon_pool.close()
+        await ssh.close()
+        if metrics_runner:
+            await metrics_runner.cleanup()
         logging.info("Все фоновые задачи остановлены.")
 
 